@@ -4,18 +4,34 @@ from __future__ import annotations
 
 import logging
 
+from bleak.backends.device import BLEDevice
+
+from homeassistant.components import bluetooth
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import Platform
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 
 from .idotmatrix.client import IDotMatrixClient
+from .idotmatrix.connection_manager import TransportMode, set_max_connections
+from .idotmatrix.modules.text import set_glyph_atlas_directory
 from .idotmatrix.screensize import ScreenSize
+from .idotmatrix.util.gif_cache import GifCache
 from .hub import IDotMatrixHub
 from .services import async_setup_services
+from .store import IDotMatrixStore
 
 from .const import (
     DOMAIN,
+    DATA_STORE,
+    DATA_GIF_CACHE,
+    GIF_CACHE_DIRECTORY,
+    GLYPH_ATLAS_DIRECTORY,
+    DEVICE_NAME_PREFIX,
     CONF_MAC,
+    CONF_IDLE_TIMEOUT,
+    CONF_PIPELINED_WRITES,
+    DEFAULT_IDLE_TIMEOUT,
+    DEFAULT_PIPELINED_WRITES,
 )
 
 _LOGGER = logging.getLogger(__name__)
@@ -26,6 +42,12 @@ _PLATFORMS: list[Platform] = [Platform.TEXT]
 async def async_setup(hass: HomeAssistant, config: dict) -> bool:
     """Set up the iDotMatrix integration."""
     hass.data.setdefault(DOMAIN, {})
+    store = IDotMatrixStore(hass)
+    await store.async_load()
+    hass.data[DATA_STORE] = store
+    hass.data[DATA_GIF_CACHE] = GifCache(directory=hass.config.path(GIF_CACHE_DIRECTORY))
+    set_max_connections(slot_limit_resolver=lambda source: _async_connection_slots(hass, source))
+    set_glyph_atlas_directory(hass.config.path(GLYPH_ATLAS_DIRECTORY))
     await async_setup_services(hass)
     return True
 
@@ -35,16 +57,63 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     hass.data.setdefault(DOMAIN, {})
     await async_setup_services(hass)
 
+    address = entry.data[CONF_MAC]
+    store: IDotMatrixStore = hass.data[DATA_STORE]
+
     client = IDotMatrixClient(
         screen_size=ScreenSize.SIZE_64x64,
-        mac_address=entry.data[CONF_MAC],
+        mac_address=address,
+        transport_mode=(
+            TransportMode.PIPELINED
+            if entry.options.get(CONF_PIPELINED_WRITES, DEFAULT_PIPELINED_WRITES)
+            else TransportMode.CONSERVATIVE
+        ),
+        mtu=store.get_mtu(address),
+        on_mtu_discovered=lambda mtu: store.async_set_mtu(address, mtu),
+        ble_device_callback=lambda address: _async_resolve_ble_device(hass, address),
+        gif_cache=hass.data[DATA_GIF_CACHE],
     )
 
-    hass.data[DOMAIN][entry.entry_id] = IDotMatrixHub(client=client)
+    hass.data[DOMAIN][entry.entry_id] = IDotMatrixHub(
+        client=client,
+        idle_timeout=entry.options.get(CONF_IDLE_TIMEOUT, DEFAULT_IDLE_TIMEOUT),
+    )
     await hass.config_entries.async_forward_entry_setups(entry, _PLATFORMS)
+    entry.async_on_unload(entry.add_update_listener(_async_update_listener))
     _LOGGER.info("Setup complete for %s", entry.data[CONF_MAC])
     return True
 
+@callback
+def _async_resolve_ble_device(hass: HomeAssistant, address: str) -> BLEDevice | None:
+    """Resolve the device from the advertisements already seen by Home Assistant, including proxies."""
+    service_info = bluetooth.async_last_service_info(hass, address, connectable=True)
+    if (
+        service_info is None
+        or not service_info.name
+        or not str(service_info.name).startswith(DEVICE_NAME_PREFIX)
+    ):
+        return None
+    return service_info.device
+
+
+@callback
+def _async_connection_slots(hass: HomeAssistant, source: str) -> int | None:
+    """Return the connection slots of a Bluetooth adapter or proxy, if Home Assistant knows them."""
+    # Not available in older Home Assistant versions, the library default is used then
+    current_allocations = getattr(bluetooth, "async_current_allocations", None)
+    if current_allocations is None:
+        return None
+    allocations = current_allocations(hass, source)
+    if not allocations:
+        return None
+    return allocations[0].slots
+
+
+async def _async_update_listener(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Reload the config entry when its options change."""
+    await hass.config_entries.async_reload(entry.entry_id)
+
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
     unload_ok = await hass.config_entries.async_unload_platforms(entry, _PLATFORMS)
@@ -52,7 +121,7 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         hub: IDotMatrixHub | None = hass.data[DOMAIN].pop(entry.entry_id, None)
         if hub:
             try:
-                await hub.client.disconnect()
+                await hub.async_shutdown()
             except Exception as err:
                 _LOGGER.warning("Error disconnecting from %s: %s", entry.data[CONF_MAC], err)
     return unload_ok
\ No newline at end of file
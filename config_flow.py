@@ -7,8 +7,15 @@ from typing import Any
 
 import voluptuous as vol
 
-from homeassistant.config_entries import ConfigFlow, ConfigFlowResult, FlowResult
+from homeassistant.config_entries import (
+    ConfigEntry,
+    ConfigFlow,
+    ConfigFlowResult,
+    FlowResult,
+    OptionsFlow,
+)
 from homeassistant.const import CONF_NAME
+from homeassistant.core import callback
 from homeassistant.components.bluetooth import (
     BluetoothServiceInfoBleak,
     async_discovered_service_info,
@@ -17,7 +24,12 @@ from homeassistant.components.bluetooth import (
 from .const import (
     DOMAIN,
     DEFAULT_DEVICE_NAME,
+    DEVICE_NAME_PREFIX,
     CONF_MAC,
+    CONF_IDLE_TIMEOUT,
+    CONF_PIPELINED_WRITES,
+    DEFAULT_IDLE_TIMEOUT,
+    DEFAULT_PIPELINED_WRITES,
 )
 
 _LOGGER = logging.getLogger(__name__)
@@ -27,6 +39,12 @@ class ConfigFlow(ConfigFlow, domain=DOMAIN):
 
     VERSION = 1
 
+    @staticmethod
+    @callback
+    def async_get_options_flow(config_entry: ConfigEntry) -> OptionsFlow:
+        """Get the options flow for this handler."""
+        return IDotMatrixOptionsFlow()
+
     async def async_step_bluetooth(
         self, discovery_info: BluetoothServiceInfoBleak
     ) -> FlowResult:
@@ -90,7 +108,7 @@ class ConfigFlow(ConfigFlow, domain=DOMAIN):
         # Look for devices
         options = {}
         for service_info in bluetooth.async_discovered_service_info(self.hass):
-             if service_info.name and str(service_info.name).startswith("IDM-"):
+             if service_info.name and str(service_info.name).startswith(DEVICE_NAME_PREFIX):
                  options[service_info.address] = f"{service_info.name} ({service_info.address})"
 
         if not options:
@@ -110,4 +128,28 @@ class ConfigFlow(ConfigFlow, domain=DOMAIN):
             step_id="user",
             data_schema=schema,
             errors=errors,
-        )
\ No newline at end of file
+        )
+
+
+class IDotMatrixOptionsFlow(OptionsFlow):
+    """Handle iDotMatrix options."""
+
+    async def async_step_init(
+        self, user_input: dict[str, Any] | None = None
+    ) -> ConfigFlowResult:
+        """Manage the connection options."""
+        if user_input is not None:
+            return self.async_create_entry(data=user_input)
+
+        schema = vol.Schema({
+            vol.Optional(
+                CONF_IDLE_TIMEOUT,
+                default=self.config_entry.options.get(CONF_IDLE_TIMEOUT, DEFAULT_IDLE_TIMEOUT),
+            ): vol.All(vol.Coerce(int), vol.Range(min=0, max=3600)),
+            vol.Optional(
+                CONF_PIPELINED_WRITES,
+                default=self.config_entry.options.get(CONF_PIPELINED_WRITES, DEFAULT_PIPELINED_WRITES),
+            ): bool,
+        })
+
+        return self.async_show_form(step_id="init", data_schema=schema)
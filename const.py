@@ -1,7 +1,27 @@
 """Constants for the iDotMatrix integration."""
 
 DOMAIN = "idotmatrix"
+DATA_STORE = f"{DOMAIN}_store"
 
 DEFAULT_DEVICE_NAME = "iDotMatrix"
+# Local name prefix advertised by iDotMatrix devices, see the bluetooth matcher in manifest.json
+DEVICE_NAME_PREFIX = "IDM-"
 
-CONF_MAC = "mac_address"
\ No newline at end of file
+CONF_MAC = "mac_address"
+CONF_IDLE_TIMEOUT = "idle_timeout"
+# Seconds the BLE link is kept open after the last command, 0 disconnects right away
+DEFAULT_IDLE_TIMEOUT = 30
+
+# Opt-in: keep several write-without-response packets in flight instead of one at a time
+CONF_PIPELINED_WRITES = "pipelined_writes"
+DEFAULT_PIPELINED_WRITES = False
+
+# Number of devices a service call targeting several entities talks to at the same time
+DEFAULT_SERVICE_CONCURRENCY = 4
+
+# Encoded GIFs are cached by file content and encoding options, shared by all devices
+DATA_GIF_CACHE = f"{DOMAIN}_gif_cache"
+GIF_CACHE_DIRECTORY = f".{DOMAIN}_gif_cache"
+
+# Glyph atlases of the fonts used for text, built on first use
+GLYPH_ATLAS_DIRECTORY = f".{DOMAIN}_glyph_atlases"
@@ -4,56 +4,350 @@ from __future__ import annotations
 
 import asyncio
 import logging
-from dataclasses import dataclass
+import zlib
+from collections.abc import AsyncIterator, Callable
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any
 
 from .idotmatrix.client import IDotMatrixClient
+from .idotmatrix.connection_manager import TransferAborted
+from .idotmatrix.modules.gif import GifModule
+from .idotmatrix.screensize import ScreenSize
+from .idotmatrix.util.gif_cache import EncodedGif
+
+from .scheduler import CommandScheduler, Grant, Priority
+
+from .const import DEFAULT_IDLE_TIMEOUT
 
 _LOGGER = logging.getLogger(__name__)
 
 
+class SharedGifUpload:
+    """A GIF file uploaded to several devices at once.
+
+    The file is encoded once per screen size and packetized once per BLE packet
+    size, and the result is shared by all devices uploading it. Encoding runs
+    in a task, so devices asking for the same screen size concurrently wait for
+    the same result instead of encoding the file again. A ``max_upload_seconds``
+    limit is converted with the upload rate of the device that encodes first.
+    """
+
+    def __init__(self, file_path: str, **encode_options: Any) -> None:
+        """Encode options are passed on to ``GifModule.encode_gif_file``."""
+        self.file_path = file_path
+        self.encode_options = encode_options
+        self._encoded: dict[ScreenSize, asyncio.Task[EncodedGif]] = {}
+        self._packets: dict[tuple[ScreenSize, int], tuple[tuple[memoryview, ...], ...]] = {}
+
+    async def async_encode(self, gif: GifModule) -> EncodedGif:
+        """Return the GIF data encoded for the screen size of the given module."""
+        task = self._encoded.get(gif.screen_size)
+        if task is None:
+            task = asyncio.create_task(gif.encode_gif_file(file_path=self.file_path, **self.encode_options))
+            self._encoded[gif.screen_size] = task
+        # shield, so one device being cancelled doesn't cancel the encoding for the others
+        return await asyncio.shield(task)
+
+    def get_packets(self, gif: GifModule, encoded_gif: EncodedGif) -> tuple[tuple[memoryview, ...], ...]:
+        """Return the upload packets for the screen and BLE packet size of the given module."""
+        key = (gif.screen_size, gif.ble_packet_size)
+        packets = self._packets.get(key)
+        if packets is None:
+            packets = self._packets[key] = gif.create_upload_packets(encoded_gif)
+        return packets
+
+
+@dataclass
+class DeviceState:
+    """What the hub last delivered to the device successfully, None if unknown."""
+
+    # Kind and CRC32 of the payload currently shown
+    content: tuple[str, int] | None = None
+    screen_on: bool | None = None
+
+
 @dataclass
 class IDotMatrixHub:
     client: IDotMatrixClient
+    idle_timeout: float = DEFAULT_IDLE_TIMEOUT
+    state: DeviceState = field(default_factory=DeviceState)
+    # Abort a chunked text transfer between chunks once newer text is waiting
+    abort_superseded_text: bool = True
 
     def __post_init__(self) -> None:
-        self._lock = asyncio.Lock()
+        self._scheduler = CommandScheduler()
+        # Sessions of commands that hold the device or were preempted by a higher priority one
+        self._open_sessions = 0
+        # Incremented by every GIF upload, an upload is superseded once it changes
+        self._media_generation = 0
+        # Generation of the last GIF upload that completed
+        self._delivered_media_generation = 0
+        self._preconnect_task: asyncio.Task | None = None
+        # Latest text waiting to be sent, with the future of the call that asked for it
+        self._pending_text: tuple[str, bool, asyncio.Future[None]] | None = None
+        self._text_task: asyncio.Task | None = None
+        self._idle_handle: asyncio.TimerHandle | None = None
+        self._idle_task: asyncio.Task | None = None
 
-    async def async_send_text(self, text: str) -> None:
-        async with self._lock:
-            _LOGGER.debug("Sending text to %s", self.client.mac_address)
+    @asynccontextmanager
+    async def _session(
+        self, priority: Priority, skip_if: Callable[[], bool] | None = None
+    ) -> AsyncIterator[Grant | None]:
+        """Hold the device and an open BLE link while running a command.
+
+        Commands get the device in priority order, see ``CommandScheduler``.
+        Long transfers yield between chunks through the returned grant, so
+        higher priority commands can run in between.
+
+        ``skip_if`` is checked once the device has been granted, when the
+        commands queued before have run, f.e. to skip a command if the device
+        already is in the resulting state. If it returns True, the link is not
+        opened and None is returned instead of a grant.
+
+        The link is kept open afterwards and only closed once it has been idle
+        for ``idle_timeout`` seconds (or right away if it is 0), so consecutive
+        commands don't pay for a new connection. A link that dropped in the
+        meantime is re-established transparently by ``connect``.
+        """
+        async with self._scheduler.hold(priority) as grant:
+            if skip_if is not None and skip_if():
+                yield None
+                return
+            self._cancel_idle_disconnect()
             await self.client.connect()
+            self._open_sessions += 1
             try:
-                await self.client.text.show_text(text)
-                _LOGGER.debug("Text sent successfully to %s", self.client.mac_address)
+                yield grant
+            except Exception:
+                # The link and what the device shows may be in an unknown state, start from scratch next time
+                self.state = DeviceState()
+                if self._open_sessions == 1:
+                    await self.client.disconnect()
+                raise
             finally:
-                await self.client.disconnect()
+                self._open_sessions -= 1
+                if self._open_sessions == 0:
+                    # A preempted command still needs the link otherwise
+                    if self.idle_timeout > 0:
+                        self._schedule_idle_disconnect()
+                    else:
+                        await self.client.disconnect()
 
-    async def async_upload_gif(self, file_path: str) -> None:
-        async with self._lock:
-            _LOGGER.debug("Uploading GIF to %s", self.client.mac_address)
-            await self.client.connect()
+    def _schedule_idle_disconnect(self) -> None:
+        self._cancel_idle_disconnect()
+        self._idle_handle = asyncio.get_running_loop().call_later(
+            self.idle_timeout, self._on_idle_timeout
+        )
+
+    def _cancel_idle_disconnect(self) -> None:
+        if self._idle_handle is not None:
+            self._idle_handle.cancel()
+            self._idle_handle = None
+
+    def _on_idle_timeout(self) -> None:
+        self._idle_handle = None
+        self._idle_task = asyncio.create_task(self._async_idle_disconnect())
+
+    async def _async_idle_disconnect(self) -> None:
+        async with self._scheduler.hold(Priority.CONTROL):
+            if self._idle_handle is not None:
+                # A command ran while we were waiting for the lock and rescheduled the timeout
+                return
+            _LOGGER.debug(
+                "Closing idle connection to %s after %ss",
+                self.client.mac_address,
+                self.idle_timeout,
+            )
             try:
-                await self.client.gif.upload_gif_file(file_path=file_path)
-                _LOGGER.debug("GIF uploaded successfully to %s", self.client.mac_address)
-            finally:
                 await self.client.disconnect()
+            except Exception as err:
+                _LOGGER.warning("Error disconnecting idle link to %s: %s", self.client.mac_address, err)
 
-    async def async_screen_on(self) -> None:
-        async with self._lock:
-            _LOGGER.debug("Turning screen on for %s", self.client.mac_address)
+    async def async_shutdown(self) -> None:
+        """Cancel the idle timer and close the link, if open."""
+        self._cancel_idle_disconnect()
+        if self._idle_task is not None:
+            self._idle_task.cancel()
+            self._idle_task = None
+        if self._text_task is not None:
+            self._text_task.cancel()
+            self._text_task = None
+        if self._pending_text is not None:
+            # the task that would have sent it is gone, don't leave the caller waiting
+            pending_future = self._pending_text[2]
+            self._pending_text = None
+            pending_future.cancel()
+        if self._preconnect_task is not None:
+            self._preconnect_task.cancel()
+            self._preconnect_task = None
+        async with self._scheduler.hold(Priority.CONTROL):
+            await self.client.disconnect()
+
+    async def _async_preconnect(self) -> None:
+        """Establish the link ahead of a command that first has to prepare its data.
+
+        Failures are only logged, the command connects again when it runs.
+        """
+        try:
             await self.client.connect()
+        except Exception as err:
+            _LOGGER.debug("Could not connect to %s ahead of time: %s", self.client.mac_address, err)
+            return
+        if self._open_sessions == 0 and self._idle_handle is None:
+            # Close the link again if the command turns out not to need it
+            self._schedule_idle_disconnect()
+
+    def _is_showing(self, content: tuple[str, int], force: bool) -> bool:
+        """Return whether the device is known to show the content already."""
+        if force or self.state.content != content:
+            return False
+        _LOGGER.debug("Skipping %s for %s, it is already shown", content[0], self.client.mac_address)
+        return True
+
+    def _is_screen(self, screen_on: bool, force: bool) -> bool:
+        """Return whether the screen is known to be on (or off) already."""
+        if force or self.state.screen_on is not screen_on:
+            return False
+        _LOGGER.debug("Screen of %s is already %s", self.client.mac_address, "on" if screen_on else "off")
+        return True
+
+    async def async_send_text(self, text: str, force: bool = False) -> None:
+        """Send text to the device, unless it is known to show the same text already.
+
+        Text updates are coalesced, latest wins: if newer text arrives before
+        this one is sent, this one is dropped and the call returns right away.
+        The device lags behind the latest text by at most one transfer.
+        """
+        future: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        if self._pending_text is not None:
+            _LOGGER.debug("Dropping superseded text for %s", self.client.mac_address)
+            superseded = self._pending_text[2]
+            if not superseded.done():
+                superseded.set_result(None)
+        self._pending_text = (text, force, future)
+        if self._text_task is None or self._text_task.done():
+            self._text_task = asyncio.create_task(self._async_process_text())
+        await future
+
+    async def _async_process_text(self) -> None:
+        """Send pending text until there is none left."""
+        while self._pending_text is not None:
+            text, force, future = self._pending_text
+            self._pending_text = None
             try:
-                await self.client.common.turn_on()
-                _LOGGER.debug("Screen turned on for %s", self.client.mac_address)
-            finally:
-                await self.client.disconnect()
+                await self._async_send_text_now(text, force)
+            except asyncio.CancelledError:
+                future.cancel()
+                raise
+            except Exception as err:
+                if not future.done():
+                    future.set_exception(err)
+            else:
+                if not future.done():
+                    future.set_result(None)
 
-    async def async_screen_off(self) -> None:
-        async with self._lock:
-            _LOGGER.debug("Turning screen off for %s", self.client.mac_address)
-            await self.client.connect()
+    def _is_text_superseded(self) -> bool:
+        return self._pending_text is not None
+
+    async def _async_send_text_now(self, text: str, force: bool) -> None:
+        text_module = self.client.text
+        data = await text_module.build_text_packet(text)
+        if self._is_text_superseded():
+            _LOGGER.debug("Dropping superseded text for %s", self.client.mac_address)
+            return
+        content = ("text", zlib.crc32(data))
+        async with self._session(Priority.TEXT, skip_if=lambda: self._is_showing(content, force)) as grant:
+            if grant is None:
+                return
+            _LOGGER.debug("Sending text to %s", self.client.mac_address)
             try:
-                await self.client.common.turn_off()
-                _LOGGER.debug("Screen turned off for %s", self.client.mac_address)
-            finally:
-                await self.client.disconnect()
+                await text_module.send_text_packet(
+                    data,
+                    should_abort=self._is_text_superseded if self.abort_superseded_text else None,
+                    between_chunks=grant.async_yield,
+                )
+            except TransferAborted:
+                # The device may show anything now, the newer text is sent next
+                self.state.content = None
+                _LOGGER.debug("Aborted superseded text transfer to %s", self.client.mac_address)
+                return
+            self.state.content = content
+            _LOGGER.debug("Text sent successfully to %s", self.client.mac_address)
+
+    async def async_upload_gif(
+        self, file_path: str, shared: SharedGifUpload | None = None, force: bool = False
+    ) -> None:
+        """Upload a GIF file to the device, unless it is known to show the same GIF already.
+
+        Pass ``shared`` when uploading the same file to several devices, so it
+        is only encoded and packetized once per screen and packet size.
+
+        A newer upload supersedes this one: it is dropped if it hasn't started
+        yet, and aborted at the next chunk boundary otherwise.
+        """
+        self._media_generation += 1
+        generation = self._media_generation
+
+        def is_superseded() -> bool:
+            return self._media_generation != generation
+
+        if shared is None:
+            shared = SharedGifUpload(file_path)
+        gif = self.client.gif
+        # Connect while encoding, end-to-end time becomes max(encode, connect) + transfer.
+        # Only when the link is kept open, otherwise nothing closes it if the upload is skipped.
+        if self.idle_timeout > 0 and (self._preconnect_task is None or self._preconnect_task.done()):
+            self._preconnect_task = asyncio.create_task(self._async_preconnect())
+        encoded_gif = await shared.async_encode(gif)
+        if encoded_gif.settings is not None:
+            _LOGGER.debug(
+                "GIF for %s reduced to %s to fit the size limit", self.client.mac_address, encoded_gif.settings
+            )
+        content = ("gif", encoded_gif.crc32)
+        # Only checked once the device is granted: an upload aborted in favour of this one leaves
+        # the device showing a partial GIF, even if it was showing this one before
+        async with self._session(Priority.MEDIA, skip_if=lambda: self._is_showing(content, force)) as grant:
+            if grant is None:
+                return
+            if is_superseded():
+                _LOGGER.debug("Dropping superseded GIF upload to %s", self.client.mac_address)
+                return
+            _LOGGER.debug("Uploading GIF to %s", self.client.mac_address)
+            try:
+                # The packet size depends on the MTU, which is only known once connected
+                await gif.upload_gif_packets(
+                    shared.get_packets(gif, encoded_gif),
+                    should_abort=is_superseded,
+                    between_chunks=grant.async_yield,
+                )
+            except TransferAborted:
+                # The device may show anything now, the newer upload is sent next,
+                # unless it already completed while this one was paused
+                if self._delivered_media_generation < generation:
+                    self.state.content = None
+                _LOGGER.debug("Aborted superseded GIF upload to %s", self.client.mac_address)
+                return
+            self._delivered_media_generation = generation
+            self.state.content = content
+            _LOGGER.debug("GIF uploaded successfully to %s", self.client.mac_address)
+
+    async def async_screen_on(self, force: bool = False) -> None:
+        # Checked once the device is granted, commands queued before may still change the screen
+        async with self._session(Priority.CONTROL, skip_if=lambda: self._is_screen(True, force)) as grant:
+            if grant is None:
+                return
+            _LOGGER.debug("Turning screen on for %s", self.client.mac_address)
+            await self.client.common.turn_on()
+            self.state.screen_on = True
+            _LOGGER.debug("Screen turned on for %s", self.client.mac_address)
+
+    async def async_screen_off(self, force: bool = False) -> None:
+        # Checked once the device is granted, commands queued before may still change the screen
+        async with self._session(Priority.CONTROL, skip_if=lambda: self._is_screen(False, force)) as grant:
+            if grant is None:
+                return
+            _LOGGER.debug("Turning screen off for %s", self.client.mac_address)
+            await self.client.common.turn_off()
+            self.state.screen_on = False
+            _LOGGER.debug("Screen turned off for %s", self.client.mac_address)
@@ -1,8 +1,13 @@
-from .connection_manager import ConnectionManager
+from typing import Any, Callable, Optional
+
+from bleak.backends.device import BLEDevice
+
+from .connection_manager import ConnectionManager, TransportMode
 from .modules.common import CommonModule
 from .modules.text import TextModule
 from .modules.gif import GifModule
 from .screensize import ScreenSize
+from .util.gif_cache import GifCache
 
 class IDotMatrixClient:
     """
@@ -13,6 +18,11 @@ class IDotMatrixClient:
         self,
         screen_size: ScreenSize,
         mac_address: str,
+        transport_mode: TransportMode = TransportMode.CONSERVATIVE,
+        mtu: Optional[int] = None,
+        on_mtu_discovered: Optional[Callable[[int], Any]] = None,
+        ble_device_callback: Optional[Callable[[str], Optional[BLEDevice]]] = None,
+        gif_cache: Optional[GifCache] = None,
     ):
         """
         Initializes the IDotMatrix client with the specified screen size and optional MAC address.
@@ -20,13 +30,24 @@ class IDotMatrixClient:
         Args:
             screen_size (ScreenSize): The size of the screen, e.g., ScreenSize.SIZE_64x64.
             mac_address (str): The Bluetooth MAC address of the iDotMatrix device.
+            transport_mode (TransportMode): How packets are written to the device, see TransportMode.
+            mtu (Optional[int]): ATT MTU negotiated with this device in a previous session, if known.
+            on_mtu_discovered (Optional[Callable[[int], Any]]): Called with the ATT MTU once it has been probed.
+            ble_device_callback (Optional[Callable[[str], Optional[BLEDevice]]]): Resolves the BLEDevice for an address,
+                instead of scanning for it on every connect.
+            gif_cache (Optional[GifCache]): Cache of encoded GIFs, can be shared between clients.
         """
         self._connection_manager = ConnectionManager(
             address=mac_address,
+            transport_mode=transport_mode,
+            mtu=mtu,
+            on_mtu_discovered=on_mtu_discovered,
+            ble_device_callback=ble_device_callback,
         )
         self._connection_manager.address = mac_address
         self.screen_size = screen_size
         self.mac_address = mac_address
+        self._gif_cache = gif_cache
 
     @property
     def common(self) -> CommonModule:
@@ -38,13 +59,15 @@ class IDotMatrixClient:
     def text(self) -> TextModule:
         return TextModule(
             connection_manager=self._connection_manager,
+            screen_size=self.screen_size,
         )
 
     @property
     def gif(self) -> GifModule:
         return GifModule(
             connection_manager=self._connection_manager,
-            screen_size=self.screen_size
+            screen_size=self.screen_size,
+            gif_cache=self._gif_cache,
         )
 
 
@@ -1,15 +1,26 @@
 import asyncio
+import functools
 import logging
+import time
 from asyncio import Task
-from collections.abc import Callable
-from typing import List, Optional, Awaitable, Any, Tuple
+from collections.abc import AsyncIterable, AsyncIterator, Callable, Sized
+from contextlib import contextmanager
+from enum import Enum
+from typing import Dict, List, Optional, Awaitable, Any, Tuple
 
 from bleak import BleakClient, BleakScanner, AdvertisementData
+from bleak.backends.device import BLEDevice
+from bleak.backends.service import BleakGATTServiceCollection
 from bleak.exc import BleakDBusError, BleakError
 
 from bleak_retry_connector import establish_connection, BleakClientWithServiceCache
 
-from .const import UUID_READ_DATA, UUID_CHARACTERISTIC_WRITE_DATA, BLUETOOTH_DEVICE_NAME
+from .const import (
+    UUID_READ_DATA,
+    UUID_CHARACTERISTIC_WRITE_DATA,
+    BLUETOOTH_DEVICE_NAME,
+    SERVICE_LAYOUT_CHARACTERISTICS,
+)
 
 class ConnectionListener:
     def __init__(
@@ -27,7 +38,224 @@ class ConnectionListener:
         self.on_disconnected = on_disconnected
 
 
-connection_manager_lock = asyncio.Lock()
+class TransferAborted(Exception):
+    """Raised when a chunked transfer is aborted between chunks, see send_packets."""
+
+
+class TransferRejected(Exception):
+    """Raised when the device acknowledges a chunk of a transfer with an error status, see send_packets."""
+
+
+class _ReplayablePackets:
+    """
+    Wraps packets produced lazily by an async iterable, so a transfer can be retried from the first packet.
+    Packets that have been produced once are kept and replayed, the rest is consumed from the source.
+    """
+
+    def __init__(self, source: AsyncIterable[List[bytearray | bytes]]) -> None:
+        self._source = source.__aiter__()
+        self._produced: List[List[bytearray | bytes]] = []
+
+    async def replay(self) -> AsyncIterator[List[bytearray | bytes]]:
+        i = 0
+        while True:
+            if i == len(self._produced):
+                try:
+                    self._produced.append(await self._source.__anext__())
+                except StopAsyncIteration:
+                    return
+            yield self._produced[i]
+            i += 1
+
+
+async def _iterate_packets(packets) -> AsyncIterator[List[bytearray | bytes]]:
+    if isinstance(packets, _ReplayablePackets):
+        async for packet in packets.replay():
+            yield packet
+    else:
+        for packet in packets:
+            yield packet
+
+
+class TransportMode(Enum):
+    """How BLE packets are written to the device."""
+    # one write at a time, with write-with-response at the end of every chunk
+    CONSERVATIVE = "conservative"
+    # a bounded window of write-without-response packets in flight, adapted to observed write errors
+    PIPELINED = "pipelined"
+
+
+PIPELINE_WINDOW_INITIAL = 4
+PIPELINE_WINDOW_MIN = 1
+PIPELINE_WINDOW_MAX = 16
+
+ATT_HEADER_SIZE = 3
+MIN_ATT_MTU = 23
+# Writes with response can't carry more than the maximum attribute value length
+MAX_ATTRIBUTE_VALUE_SIZE = 512
+# Used until the MTU of the link is known, matches the 509 byte packets of the official app
+FALLBACK_ATT_MTU = 512
+
+# Maximum wait for the notification of a command the device is known to acknowledge
+COMMAND_ACK_TIMEOUT_S = 2.0
+
+# Chunk acknowledgements are frames of [length (2 bytes), command, subcommand, status]
+CHUNK_ACK_STATUS_OFFSET = 4
+# Chunk received and ready for the next one, or the whole transfer received
+CHUNK_ACK_STATUS_OK = (1, 3)
+
+# Transfers shorter than this are dominated by latency and don't give a useful upload rate
+UPLOAD_RATE_MIN_BYTES = 4096
+
+# Typical number of simultaneous connections a Bluetooth adapter or proxy can hold
+DEFAULT_MAX_CONNECTIONS = 3
+
+# connect() and disconnect() are serialized per device address, independent devices don't block each other
+_connection_locks: Dict[str, asyncio.Lock] = {}
+
+
+def _get_connection_lock(address: Optional[str]) -> asyncio.Lock:
+    """Returns the lock guarding connection state changes for the given device address."""
+    key = (address or "").upper()
+    if key not in _connection_locks:
+        _connection_locks[key] = asyncio.Lock()
+    return _connection_locks[key]
+
+
+class ConnectionSlots:
+    """
+    Limit on the number of simultaneously connected devices, matching the connection slots of an adapter or proxy.
+    When all slots are taken, the least recently used idle connection is closed to make room.
+    """
+
+    def __init__(self, limit: int) -> None:
+        """
+        Args:
+            limit (int): Maximum number of simultaneous connections.
+        """
+        if limit < 1:
+            raise ValueError("limit must be at least 1")
+        self.limit = limit
+        self._semaphore = asyncio.Semaphore(limit)
+        self._holders: Dict["ConnectionManager", None] = {}
+        self._waiters = 0
+        # holders being disconnected to make room for a waiter
+        self._evicting: set["ConnectionManager"] = set()
+
+    async def acquire(self, manager: "ConnectionManager") -> None:
+        """
+        Waits for a free connection slot and assigns it to the given manager.
+        """
+        if manager in self._holders:
+            return
+        self._waiters += 1
+        try:
+            self.evict_idle()
+            await self._semaphore.acquire()
+        finally:
+            self._waiters -= 1
+        self._holders[manager] = None
+
+    def evict_idle(self) -> None:
+        """
+        Closes the least recently used idle connection if a device is waiting for a slot.
+        Called when a device asks for a slot and whenever a connection becomes idle, so waiters don't have to wait
+        for holders to be closed otherwise.
+        """
+        # slots without a holder are free or being handed over to a waiter
+        unserved_waiters = self._waiters - (self.limit - len(self._holders)) - len(self._evicting)
+        if unserved_waiters <= 0:
+            return
+        idle = [holder for holder in self._holders if not holder.is_busy() and holder not in self._evicting]
+        if not idle:
+            return
+        victim = min(idle, key=lambda holder: holder.last_used)
+        ConnectionManager.logging.info(
+            f"all {self.limit} connection slots in use, closing idle connection to {victim.address}"
+        )
+        self._evicting.add(victim)
+        asyncio.ensure_future(self._evict(victim))
+
+    async def _evict(self, victim: "ConnectionManager") -> None:
+        try:
+            await victim.disconnect(only_if_idle=True)
+        except Exception as e:
+            ConnectionManager.logging.warning(f"could not close idle connection to {victim.address}: {e}")
+        finally:
+            self._evicting.discard(victim)
+        # the victim may have become busy in the meantime, try the next one
+        self.evict_idle()
+
+    def release(self, manager: "ConnectionManager") -> None:
+        """
+        Frees the connection slot held by the given manager, if any.
+        """
+        if self._holders.pop(manager, False) is None:
+            self._semaphore.release()
+
+
+# One set of connection slots per Bluetooth adapter or proxy, by its source address, see get_connection_slots
+_connection_slots_by_source: Dict[Optional[str], ConnectionSlots] = {}
+_default_max_connections = DEFAULT_MAX_CONNECTIONS
+_slot_limit_resolver: Optional[Callable[[str], Optional[int]]] = None
+
+
+def set_max_connections(
+    limit: int = DEFAULT_MAX_CONNECTIONS,
+    slot_limit_resolver: Optional[Callable[[str], Optional[int]]] = None,
+) -> None:
+    """
+    Sets how many devices can be connected at the same time through each Bluetooth adapter or proxy.
+    Connections that are already established keep their slot until they are closed.
+    Args:
+        limit (int): Maximum number of simultaneous connections of an adapter whose capacity is not known.
+        slot_limit_resolver (Optional[Callable[[str], Optional[int]]]): Returns the number of connection slots of an
+            adapter or proxy by its source address, or None if it is not known, f.e. from Home Assistant.
+    """
+    global _default_max_connections, _slot_limit_resolver
+    if limit < 1:
+        raise ValueError("limit must be at least 1")
+    _default_max_connections = limit
+    _slot_limit_resolver = slot_limit_resolver
+    _connection_slots_by_source.clear()
+
+
+def get_connection_slots(source: Optional[str]) -> ConnectionSlots:
+    """
+    Returns the connection slots of the Bluetooth adapter or proxy with the given source address.
+    Args:
+        source (Optional[str]): Source address of the adapter or proxy, None if it is not known.
+    """
+    slots = _connection_slots_by_source.get(source)
+    if slots is None:
+        limit = None
+        if source is not None and _slot_limit_resolver is not None:
+            limit = _slot_limit_resolver(source)
+        slots = ConnectionSlots(limit if limit and limit > 0 else _default_max_connections)
+        _connection_slots_by_source[source] = slots
+    return slots
+
+
+def _device_source(device: Any) -> Optional[str]:
+    """
+    Returns the source address of the adapter or proxy a device was seen by, as reported by Home Assistant
+    in the details of the BLEDevice, or None if it is not known.
+    """
+    details = getattr(device, "details", None)
+    if isinstance(details, dict):
+        return details.get("source")
+    return None
+
+
+def _in_use_during(func):
+    """Marks the connection of a ConnectionManager as busy while the decorated coroutine runs, see _in_use."""
+    @functools.wraps(func)
+    async def wrapper(self: "ConnectionManager", *args, **kwargs):
+        with self._in_use():
+            return await func(self, *args, **kwargs)
+
+    return wrapper
+
 
 class ConnectionManager:
     logging = logging.getLogger(__name__)
@@ -35,12 +263,21 @@ class ConnectionManager:
     def __init__(
         self,
         address: Optional[str] = None,
+        transport_mode: TransportMode = TransportMode.CONSERVATIVE,
+        mtu: Optional[int] = None,
+        on_mtu_discovered: Optional[Callable[[int], Any]] = None,
+        ble_device_callback: Optional[Callable[[str], Optional[BLEDevice]]] = None,
     ) -> None:
         """
         Initializes the ConnectionManager with an optional Bluetooth address.
         Args:
             address (Optional[str]): The Bluetooth address (MAC) of the iDotMatrix device, f.e. "00:11:22:33:44:55".
             If no address is provided, the instance can be used to discover devices and set the address later.
+            transport_mode (TransportMode): How packets are written to the device. Defaults to TransportMode.CONSERVATIVE.
+            mtu (Optional[int]): ATT MTU negotiated with this device in a previous session, skips probing it again.
+            on_mtu_discovered (Optional[Callable[[int], Any]]): Called with the ATT MTU once it has been probed, so it can be persisted.
+            ble_device_callback (Optional[Callable[[str], Optional[BLEDevice]]]): Resolves the BLEDevice for an address from
+            already known advertisements, f.e. those seen by Home Assistant. If not provided, a scan is started on every connect.
         """
         self.address: Optional[str] = None
         self.client: Optional[BleakClient] = None
@@ -54,7 +291,27 @@ class ConnectionManager:
         self._is_auto_reconnect_active = False
         self._reconnect_loop_task: Optional[Task] = None
 
-        self._ble_packet_size = None
+        self._mtu: Optional[int] = mtu
+        self._on_mtu_discovered = on_mtu_discovered
+        self._ble_device_callback = ble_device_callback
+
+        # services of the last validated connection, reused to skip service discovery on the next one
+        self._cached_services: Optional[BleakGATTServiceCollection] = None
+        self._service_layout: Dict[str, int] = {}
+
+        self._transport_mode = transport_mode
+        self._pipeline_window = PIPELINE_WINDOW_INITIAL
+
+        self._notifications_enabled = False
+        self._notification_queue: asyncio.Queue[bytes] = asyncio.Queue()
+        # whether the device answered the last command of each type with a notification
+        self._command_acks: Dict[bytes, bool] = {}
+        # payload bytes per second of the last chunked transfer, None until one has been measured
+        self._upload_bytes_per_second: Optional[float] = None
+
+        self._connection_slots: Optional[ConnectionSlots] = None
+        self._active_operations = 0
+        self.last_used = 0.0
 
         self._connection_listeners: List[ConnectionListener] = []
 
@@ -89,6 +346,15 @@ class ConnectionManager:
         """
         self.address = address
 
+    def set_transport_mode(self, transport_mode: TransportMode) -> None:
+        """
+        Sets how packets are written to the device.
+        Args:
+            transport_mode (TransportMode): TransportMode.PIPELINED keeps several write-without-response packets in flight,
+            TransportMode.CONSERVATIVE awaits every write before sending the next one.
+        """
+        self._transport_mode = transport_mode
+
     async def connect_by_address(self, address: str) -> None:
         """
         Connects to the iDotMatrix device using the provided address.
@@ -116,17 +382,20 @@ class ConnectionManager:
         raise AssertionError(
             "No iDotMatrix devices found. Please ensure the device is powered on, in range, and not connected to another device.")
 
+    @_in_use_during
     async def connect(self, device: Optional[Any] = None) -> None:
         """
         Connects to the device using the address set in the ConnectionManager.
         If the client is already connected, it does nothing.
         Uses bleak-retry-connector for reliable connection establishment with retry logic.
         Args:
-            device: Optional BLEDevice from discovery. If not provided, device is resolved by address.
+            device: Optional BLEDevice from discovery. If not provided, device is resolved by address,
+            using the ble_device_callback if set or a scan otherwise.
         Raises:
             ValueError: If the device address is not set.
+            ConnectionError: If the device can't be found.
         """
-        async with connection_manager_lock:
+        async with _get_connection_lock(self.address):
             if self._auto_reconnect:
                 self._is_auto_reconnect_active = True
             if not self.address:
@@ -136,50 +405,338 @@ class ConnectionManager:
             if not self.is_connected():
                 self.logging.info(f"connecting to {self.address}...")
                 if device is None:
-                    device = await BleakScanner.find_device_by_address(self.address)
+                    device = await self._resolve_device()
                 if device is None:
                     raise ConnectionError(f"Could not find device {self.address}")
-                self.client = await establish_connection(
-                    BleakClientWithServiceCache,
-                    device,
-                    name=device.name or self.address,
-                    disconnected_callback=self._on_disconnected,
-                    use_services_cache=False,  # Fresh discovery each time; cache can cause "Failed to initiate write"
-                )
-                self._connected = True
-                self.logging.info(f"connected to {self.address}")
-                # Give the device time to stabilize before GATT operations
-                await asyncio.sleep(0.5)
-
-                # print service and characteristic information for debugging
-                for service in self.client.services:
-                    self.logging.debug(f"Service: {service.uuid} ({service.handle})")
-                    for characteristic in service.characteristics:
-                        self.logging.debug(
-                            f"  Characteristic: {characteristic.uuid} ({characteristic.handle}): {characteristic.description}")
-                        self.logging.debug(f"    Properties: {characteristic.properties}")
-                        self.logging.debug(
-                            f"    Max Write Without Response Size: {characteristic.max_write_without_response_size}")
+                self._connection_slots = get_connection_slots(_device_source(device))
+                await self._connection_slots.acquire(self)
+                try:
+                    await self._connect_device(device)
+                except BaseException:
+                    self._connected = False
+                    if self.client is not None and self.client.is_connected:
+                        await self.client.disconnect()
+                    self._release_connection_slot()
+                    raise
             else:
                 self.logging.info(f"already connected to {self.address}")
 
         self._notify_connection_listeners_connected()
 
-    async def disconnect(self) -> None:
+    async def _connect_device(self, device: Any) -> None:
+        """
+        Establishes the connection to the given device and prepares it for GATT operations.
+        Args:
+            device: The BLEDevice to connect to.
+        """
+        self.client = await self._establish_connection(device)
+        self._connected = True
+        self.logging.info(f"connected to {self.address}")
+        # Give the device time to stabilize before GATT operations
+        await asyncio.sleep(0.5)
+
+        if not await self._verify_services():
+            self.logging.warning(f"cached services of {self.address} are stale, rediscovering...")
+            await self._invalidate_service_cache()
+            self._connected = False
+            await self.client.disconnect()
+            self.client = await self._establish_connection(device)
+            self._connected = True
+            await asyncio.sleep(0.5)
+            if not await self._verify_services():
+                raise ConnectionError(f"{self.address} does not expose the expected characteristics")
+
+        await self._resolve_mtu()
+
+    async def _resolve_device(self) -> Optional[BLEDevice]:
+        """
+        Resolves the BLEDevice for the configured address.
+        Returns:
+            Optional[BLEDevice]: The device, or None if it is not currently known or in range.
+        """
+        if self._ble_device_callback is not None:
+            return self._ble_device_callback(self.address)
+        return await BleakScanner.find_device_by_address(self.address)
+
+    async def _establish_connection(self, device: Any) -> BleakClient:
+        """
+        Establishes the connection, reusing the cached services of the previous connection if there are any.
+        Args:
+            device: The BLEDevice to connect to.
+        Returns:
+            BleakClient: The connected client.
+        """
+        use_services_cache = self._cached_services is not None
+        client = await establish_connection(
+            BleakClientWithServiceCache,
+            device,
+            name=device.name or self.address,
+            disconnected_callback=self._on_disconnected,
+            use_services_cache=use_services_cache,
+            cached_services=self._cached_services,
+            # pick up the latest advertisement (f.e. through another adapter or proxy) between attempts
+            ble_device_callback=(
+                (lambda: self._ble_device_callback(self.address) or device)
+                if self._ble_device_callback is not None
+                else None
+            ),
+        )
+        if not use_services_cache and self.logging.isEnabledFor(logging.DEBUG):
+            # print service and characteristic information for debugging
+            for service in client.services:
+                self.logging.debug(f"Service: {service.uuid} ({service.handle})")
+                for characteristic in service.characteristics:
+                    self.logging.debug(
+                        f"  Characteristic: {characteristic.uuid} ({characteristic.handle}): {characteristic.description}")
+                    self.logging.debug(f"    Properties: {characteristic.properties}")
+                    self.logging.debug(
+                        f"    Max Write Without Response Size: {characteristic.max_write_without_response_size}")
+        return client
+
+    async def _verify_services(self) -> bool:
+        """
+        Checks that the services of the current connection have the expected layout and caches them for the next
+        connection. Subscribing to notifications doubles as a cheap round trip that fails if cached handles are stale.
+        Returns:
+            bool: False if the services came from the cache and turned out to be stale, True otherwise.
+        Raises:
+            ConnectionError: If freshly discovered services lack the characteristics needed to talk to the device.
+        """
+        from_cache = self._cached_services is not None
+        layout = {}
+        for uuid in SERVICE_LAYOUT_CHARACTERISTICS:
+            characteristic = self.client.services.get_characteristic(uuid)
+            if characteristic is not None:
+                layout[uuid] = characteristic.handle
+
+        missing = [uuid for uuid in (UUID_CHARACTERISTIC_WRITE_DATA, UUID_READ_DATA) if uuid not in layout]
+        if missing:
+            if from_cache:
+                return False
+            raise ConnectionError(f"{self.address} does not expose the expected characteristics: {missing}")
+        if self._service_layout and layout != self._service_layout:
+            self.logging.warning(f"service layout of {self.address} changed: {self._service_layout} -> {layout}")
+            if from_cache:
+                return False
+
+        if not await self._start_notifications() and from_cache:
+            return False
+
+        self._service_layout = layout
+        self._cached_services = self.client.services
+        return True
+
+    async def _invalidate_service_cache(self) -> None:
+        """
+        Drops the cached services, so that the next connection performs a full service discovery.
+        """
+        self._cached_services = None
+        if self.client is not None and hasattr(self.client, "clear_cache"):
+            try:
+                await self.client.clear_cache()
+            except Exception as e:
+                self.logging.debug(f"could not clear the service cache: {e}")
+
+    async def disconnect(self, only_if_idle: bool = False) -> None:
         """
         Disconnects from the device if connected.
         If the client is not connected, this method does nothing.
+        Args:
+            only_if_idle (bool): Don't disconnect if a connection attempt or a transfer is in progress,
+                f.e. when closing the connection to free its slot.
         """
-        # Disable auto-reconnect during active disconnection, it will be re-enabled on active connection attempt
-        self._is_auto_reconnect_active = False
-        self._ble_packet_size = None  # Clear cached value; services are cleared on disconnect
-        async with connection_manager_lock:
+        if only_if_idle and self.is_busy():
+            return
+        if not only_if_idle:
+            # Disable auto-reconnect during active disconnection, it will be re-enabled on active connection attempt
+            self._is_auto_reconnect_active = False
+            self._notifications_enabled = False
+        async with _get_connection_lock(self.address):
+            if only_if_idle:
+                if self.is_busy():
+                    # a transfer started while waiting for the lock, it keeps the connection
+                    return
+                self._is_auto_reconnect_active = False
+                self._notifications_enabled = False
             if self._reconnect_loop_task:
                 self._reconnect_loop_task.cancel()
                 self._reconnect_loop_task = None
             if self.is_connected():
                 await self.client.disconnect()
             self._connected = False
+            self._release_connection_slot()
+
+    def _release_connection_slot(self) -> None:
+        """
+        Gives the connection slot of this device back, once it is no longer connected.
+        """
+        if self._connection_slots is not None:
+            self._connection_slots.release(self)
+            self._connection_slots = None
+
+    @contextmanager
+    def _in_use(self):
+        """
+        Marks the connection as busy while connecting or transferring, so it isn't closed to free its slot.
+        """
+        self._active_operations += 1
+        try:
+            yield
+        finally:
+            self._active_operations -= 1
+            self.last_used = time.monotonic()
+            if self._active_operations == 0 and self._connection_slots is not None:
+                # a device may be waiting for the slot of this connection
+                self._connection_slots.evict_idle()
+
+    def is_busy(self) -> bool:
+        """
+        Checks if a connection attempt or a transfer is in progress.
+        Returns:
+            bool: True if busy, False if the connection is idle.
+        """
+        return self._active_operations > 0
+
+    @property
+    def upload_bytes_per_second(self) -> Optional[float]:
+        """The rate of the last chunked transfer to the device, or None if none has been measured yet."""
+        return self._upload_bytes_per_second
+
+    @property
+    def mtu(self) -> Optional[int]:
+        """The ATT MTU of the link to the device, or None if it has not been determined yet."""
+        return self._mtu
+
+    async def _resolve_mtu(self) -> None:
+        """
+        Determines the ATT MTU negotiated for the current link, unless it is already known from a previous session.
+        The MTU is kept across disconnects, but the device may be reached through another adapter or proxy with a
+        smaller MTU, so a known MTU is lowered if the backend reports a smaller one for the current link.
+        """
+        if self._mtu is not None:
+            mtu = self.client.mtu_size
+            if MIN_ATT_MTU < mtu < self._mtu:
+                self.logging.info(f"MTU for {self.address} is {mtu} bytes on this link, lowering it from {self._mtu} bytes")
+                self._mtu = mtu
+                if self._on_mtu_discovered:
+                    self._on_mtu_discovered(mtu)
+            return
+
+        mtu = self.client.mtu_size
+        if mtu <= MIN_ATT_MTU:
+            # BlueZ only reports the negotiated MTU after it has been acquired
+            acquire_mtu = getattr(getattr(self.client, "_backend", None), "_acquire_mtu", None)
+            if acquire_mtu is not None:
+                try:
+                    await acquire_mtu()
+                    mtu = self.client.mtu_size
+                except Exception as e:
+                    self.logging.debug(f"could not acquire MTU: {e}")
+        if mtu <= MIN_ATT_MTU:
+            char = self.client.services.get_characteristic(UUID_CHARACTERISTIC_WRITE_DATA)
+            if char is not None and char.max_write_without_response_size > MIN_ATT_MTU - ATT_HEADER_SIZE:
+                mtu = char.max_write_without_response_size + ATT_HEADER_SIZE
+        if mtu <= MIN_ATT_MTU:
+            self.logging.warning(f"could not determine the MTU for {self.address}, assuming {FALLBACK_ATT_MTU} bytes")
+            return
+
+        self.logging.info(f"negotiated MTU for {self.address} is {mtu} bytes")
+        self._mtu = mtu
+        if self._on_mtu_discovered:
+            self._on_mtu_discovered(mtu)
+
+    async def _start_notifications(self) -> bool:
+        """
+        Subscribes to notifications on the read characteristic (fa03), which the device uses to acknowledge chunks.
+        If the subscription fails, transfers fall back to fixed delays between packets.
+        Returns:
+            bool: True if the subscription succeeded.
+        """
+        self._drain_notifications()
+        try:
+            await self.client.start_notify(UUID_READ_DATA, self._on_notification)
+            self._notifications_enabled = True
+        except Exception as e:
+            self._notifications_enabled = False
+            self.logging.warning(f"could not subscribe to notifications, falling back to fixed delays: {e}")
+        return self._notifications_enabled
+
+    def _on_notification(self, _sender: Any, data: bytearray) -> None:
+        """
+        Callback for notifications on the read characteristic, queues the received frame.
+        """
+        self.logging.debug(f"received notification: {data.hex()}")
+        self._notification_queue.put_nowait(bytes(data))
+
+    def _drain_notifications(self) -> None:
+        """
+        Discards notifications that have not been consumed yet, so that stale frames aren't mistaken for new ones.
+        """
+        while not self._notification_queue.empty():
+            self._notification_queue.get_nowait()
+
+    async def wait_for_notification(self, timeout: float) -> Optional[bytes]:
+        """
+        Waits for the next notification from the device.
+        Args:
+            timeout (float): Maximum time to wait, in seconds.
+        Returns:
+            Optional[bytes]: The received frame, or None if notifications are unavailable or none arrived in time.
+        """
+        if not self._notifications_enabled:
+            return None
+        try:
+            return await asyncio.wait_for(self._notification_queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def _wait_for_ack(self, command: int, timeout: float, min_length: int = 3) -> Optional[bytes]:
+        """
+        Waits for the device to acknowledge a command or a chunk of a transfer, skipping frames that don't belong to it.
+        Args:
+            command (int): The command byte, the acknowledgement repeats it.
+            timeout (float): Maximum time to wait, in seconds.
+            min_length (int): Minimum length of the acknowledgement, shorter frames are skipped. Defaults to 3.
+        Returns:
+            Optional[bytes]: The acknowledgement, or None if none arrived in time.
+        """
+        deadline = asyncio.get_running_loop().time() + timeout
+        while True:
+            remaining = deadline - asyncio.get_running_loop().time()
+            frame = await self.wait_for_notification(remaining) if remaining > 0 else None
+            if frame is None:
+                return None
+            if len(frame) >= min_length and frame[2] == command:
+                return frame
+            self.logging.debug(f"ignoring notification while waiting for an acknowledgement: {frame.hex()}")
+
+    async def wait_for_command_completion(self, command: bytes, settle_delay: float) -> None:
+        """
+        Waits until the device has processed a command that was just sent.
+        Commands the device acknowledges on fa03 complete as soon as a notification repeating the command byte
+        arrives. For other commands, or if notifications are unavailable, this waits for the settle delay. Whether a
+        command type is acknowledged is learned the first time it is sent: the notification is awaited for at most the
+        settle delay then.
+        Args:
+            command (bytes): Identifies the command type, f.e. the command and subcommand bytes of the packet.
+            settle_delay (float): Time the device needs to process the command if it doesn't acknowledge it, in seconds.
+        """
+        acknowledged = self._command_acks.get(command)
+        if self._notifications_enabled and command and acknowledged is not False:
+            timeout = max(settle_delay, COMMAND_ACK_TIMEOUT_S) if acknowledged else settle_delay
+            # only a frame repeating the command byte counts, stray frames must not complete it or mark it as
+            # acknowledged
+            ack = await self._wait_for_ack(command[0], timeout)
+            if ack is not None:
+                self.logging.debug(f"command {command.hex()} acknowledged: {ack.hex()}")
+                self._command_acks[command] = True
+                return
+            if acknowledged:
+                self.logging.warning(f"no acknowledgement for command {command.hex()} within {timeout}s")
+            # the settle delay has passed while waiting
+            self._command_acks[command] = False
+            return
+        await asyncio.sleep(settle_delay)
 
     def is_connected(self) -> bool:
         """
@@ -191,6 +748,7 @@ class ConnectionManager:
             return False
         return self.client.is_connected or self._connected
 
+    @_in_use_during
     async def send_bytes(
         self,
         data: bytearray | bytes,
@@ -206,10 +764,19 @@ class ConnectionManager:
         if not self.is_connected():
             await self.connect()
 
+        # notifications that arrive from now on answer this command
+        self._drain_notifications()
+        # slices of a memoryview don't copy the data
+        data = memoryview(data)
         for retry_attempt in range(2):
             try:
                 self.logging.debug("sending raw data to device")
                 ble_packet_size = await self.get_max_bytes_per_chunk(response)
+                if retry_attempt == 0 and self._use_pipeline(response):
+                    await self._write_pipelined(
+                        [data[packet:packet + ble_packet_size] for packet in range(0, len(data), ble_packet_size)]
+                    )
+                    return
                 for packet in range(0, len(data), ble_packet_size):
                     self.logging.debug(f"sending chunk {packet // ble_packet_size + 1} of {len(data) // ble_packet_size + 1}")
                     await self.client.write_gatt_char(
@@ -217,14 +784,24 @@ class ConnectionManager:
                         data=data[packet:packet + ble_packet_size],
                         response=response)
                 return
+            except TransferRejected as e:
+                if retry_attempt == 0:
+                    # the transfer starts over with the first chunk, which resets it on the device
+                    self.logging.warning("device rejected the transfer, retrying: %s", e)
+                else:
+                    raise
             except Exception as e:
                 if retry_attempt == 0 and (
-                    self._is_service_discovery_error(e) or self._is_write_failed_error(e)
+                    self._is_service_discovery_error(e)
+                    or self._is_write_failed_error(e)
+                    or (self._transport_mode is TransportMode.PIPELINED and self._is_retryable_write_error(e))
                 ):
                     self.logging.warning(
                         "BLE error (reconnecting and retrying): %s",
                         e,
                     )
+                    if self._is_service_discovery_error(e) or self._is_write_failed_error(e):
+                        await self._invalidate_service_cache()
                     await self.disconnect()
                     await self.connect()
                 else:
@@ -234,6 +811,54 @@ class ConnectionManager:
         """Check if the exception is due to service discovery not being performed yet."""
         return isinstance(e, BleakError) and "Service Discovery has not been performed yet" in str(e)
 
+    @staticmethod
+    def _is_retryable_write_error(e: Exception) -> bool:
+        """Check if a single GATT write failed in a way that is worth retrying (e.g. ATT error 0x0e)."""
+        if not isinstance(e, BleakDBusError):
+            return False
+        err_str = str(e).lower()
+        return "0x0e" in err_str or "failed" in err_str or "failed to initiate write" in err_str
+
+    def _use_pipeline(self, response: bool) -> bool:
+        """Check if writes without response should be pipelined."""
+        return self._transport_mode is TransportMode.PIPELINED and not response
+
+    async def _write_pipelined(self, ble_packets: List[bytearray | bytes]) -> None:
+        """
+        Writes packets without response, keeping up to the current window of writes in flight.
+        The window grows by one after every successful call and is halved on write errors, in which case the error
+        is re-raised so the caller can retry the transfer on the conservative path.
+        Args:
+            ble_packets (List[bytearray | bytes]): The packets to write, in order.
+        """
+        window = self._pipeline_window
+        in_flight: set[asyncio.Task] = set()
+        try:
+            for ble_packet in ble_packets:
+                if len(in_flight) >= window:
+                    done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        task.result()
+                in_flight.add(asyncio.create_task(self.client.write_gatt_char(
+                    char_specifier=UUID_CHARACTERISTIC_WRITE_DATA,
+                    data=ble_packet,
+                    response=False,
+                )))
+            if in_flight:
+                done, in_flight = await asyncio.wait(in_flight)
+                for task in done:
+                    task.result()
+        except BaseException as e:
+            for task in in_flight:
+                task.cancel()
+            if self._is_retryable_write_error(e):
+                self._pipeline_window = max(PIPELINE_WINDOW_MIN, window // 2)
+                self.logging.warning(
+                    f"pipelined write failed with a window of {window}, reducing it to {self._pipeline_window}: {e}"
+                )
+            raise
+        self._pipeline_window = min(PIPELINE_WINDOW_MAX, window + 1)
+
     def _is_write_failed_error(self, e: Exception) -> bool:
         """Check if the exception is a transient BLE write failure (e.g. Failed to initiate write)."""
         if not isinstance(e, BleakDBusError):
@@ -241,7 +866,14 @@ class ConnectionManager:
         err_str = str(e).lower()
         return "failed" in err_str or "failed to initiate write" in err_str
 
-    async def send_packets(self, packets: List[List[bytearray | bytes]], response: bool = False):
+    @_in_use_during
+    async def send_packets(
+        self,
+        packets: List[List[bytearray | bytes]] | AsyncIterable[List[bytearray | bytes]],
+        response: bool = False,
+        should_abort: Optional[Callable[[], bool]] = None,
+        between_packets: Optional[Callable[[], Awaitable[Any]]] = None,
+    ):
         """
         Sends multiple packets to the device.
         Each packet is a list of bytearrays or bytes, which will be sent sequentially.
@@ -251,10 +883,15 @@ class ConnectionManager:
         1. The outer chunking for the data itself, which is defined in the protocol for a command.
         2. The inner chunking for transmitting over BLE, which is defined by the MTU size of the BLE connection, or the protocol of the command.
         Args:
-            packets: A list of packets, where each packet is a list of bytearrays or bytes.
+            packets: A list of packets, where each packet is a list of bytearrays or bytes. Can also be an async iterable
+                producing the packets lazily, f.e. while the data is still being prepared.
             response: If True, a write-with-response operation will be used, otherwise a write-without-response operation will be used.
+            should_abort: Called before every packet but the first, the transfer is aborted with TransferAborted if it returns True.
+            between_packets: Awaited before every packet but the first, f.e. to let other commands run in between.
         """
-        if len(packets) == 0:
+        if isinstance(packets, AsyncIterable):
+            packets = _ReplayablePackets(packets)
+        elif len(packets) == 0:
             self.logging.warning("no packets to send, skipping")
             return
         if not self.is_connected():
@@ -262,99 +899,174 @@ class ConnectionManager:
 
         for retry_attempt in range(2):
             try:
-                await self._do_send_packets(packets, response)
+                # a failed pipelined transfer is retried on the conservative path
+                await self._do_send_packets(
+                    packets,
+                    response,
+                    pipelined=retry_attempt == 0 and self._transport_mode is TransportMode.PIPELINED,
+                    should_abort=should_abort,
+                    between_packets=between_packets,
+                )
                 return
+            except TransferRejected as e:
+                if retry_attempt == 0:
+                    # the transfer starts over with the first chunk, which resets it on the device
+                    self.logging.warning("device rejected the transfer, retrying: %s", e)
+                else:
+                    raise
             except Exception as e:
                 if retry_attempt == 0 and (
-                    self._is_service_discovery_error(e) or self._is_write_failed_error(e)
+                    self._is_service_discovery_error(e)
+                    or self._is_write_failed_error(e)
+                    or (self._transport_mode is TransportMode.PIPELINED and self._is_retryable_write_error(e))
                 ):
                     self.logging.warning(
                         "BLE error (reconnecting and retrying): %s",
                         e,
                     )
+                    if self._is_service_discovery_error(e) or self._is_write_failed_error(e):
+                        await self._invalidate_service_cache()
                     await self.disconnect()
                     await self.connect()
                 else:
                     raise
 
-    async def _do_send_packets(self, packets: List[List[bytearray | bytes]], response: bool = False):
+    async def _do_send_packets(
+        self,
+        packets: List[List[bytearray | bytes]] | _ReplayablePackets,
+        response: bool = False,
+        pipelined: bool = False,
+        should_abort: Optional[Callable[[], bool]] = None,
+        between_packets: Optional[Callable[[], Awaitable[Any]]] = None,
+    ):
         """Internal implementation of send_packets (called with retry on service discovery error)."""
-        total_byte_count = 0
-        for packet in packets:
-            for ble_packet in packet:
-                total_byte_count += len(ble_packet)
-
-        self.logging.debug(
-            f"sending {len(packets)} packet(s) in chunks of size {len(packets[0][0])} bytes to device, for a total size of {total_byte_count} bytes"
-        )
+        if isinstance(packets, Sized):
+            total = len(packets)
+            total_byte_count = sum(len(ble_packet) for packet in packets for ble_packet in packet)
+            self.logging.debug(
+                f"sending {total} packet(s) in chunks of size {len(packets[0][0])} bytes to device, for a total size of {total_byte_count} bytes"
+            )
+        else:
+            total = "?"
+            self.logging.debug("sending packets to device as they are produced")
 
         ble_packet_size = await self.get_max_bytes_per_chunk(response)
         self.logging.debug(f"ble_packet_size size is {ble_packet_size} bytes")
 
-        PACKET_DELAY_S = 0.1  # Longer delay for reliability with write-with-response
+        # Used between packets only if the device does not acknowledge chunks via notifications
+        PACKET_DELAY_S = 0.1
+        ACK_TIMEOUT_S = 5.0
+
+        use_acks = self._notifications_enabled
+        i = -1
+        # time spent waiting for packets to be produced or for other commands doesn't count for the upload rate
+        started = None
+        paused = 0.0
+        sent_byte_count = 0
+        async for packet in _iterate_packets(packets):
+            i += 1
+            if started is None:
+                started = time.monotonic()
+            if i > 0 and between_packets is not None:
+                pause_started = time.monotonic()
+                await between_packets()
+                paused += time.monotonic() - pause_started
+            if i > 0 and should_abort is not None and should_abort():
+                raise TransferAborted(f"transfer aborted after {i} of {total} packets")
+            self._drain_notifications()
+            if pipelined:
+                # the chunk acknowledgement replaces the write-with-response at the end of the chunk
+                last_with_response = response and not use_acks
+                self.logging.debug(f"sending packet {i + 1} of {total} pipelined")
+                await self._write_pipelined(packet[:-1] if last_with_response else packet)
+                if last_with_response:
+                    await self._write_with_retry(packet[-1], True, f"{i + 1}.{len(packet)}")
+            else:
+                for j, ble_paket in enumerate(packet):
+                    if not use_acks and (i > 0 or j > 0):
+                        await asyncio.sleep(PACKET_DELAY_S)
+                    self.logging.debug(f"sending packet {i + 1}.{j + 1} of {total}.{len(packet)}")
+                    wait_for_response = response if j == len(packet) - 1 else False
+                    await self._write_with_retry(ble_paket, wait_for_response, f"{i + 1}.{j + 1}")
+            if response and use_acks:
+                # the device acknowledges every chunk on fa03 once it is ready for the next one
+                ack = await self._wait_for_ack(packet[0][2], ACK_TIMEOUT_S, min_length=CHUNK_ACK_STATUS_OFFSET + 1)
+                if ack is None:
+                    self.logging.warning(
+                        f"no acknowledgement for chunk {i + 1} of {total} within {ACK_TIMEOUT_S}s, "
+                        f"falling back to fixed delays"
+                    )
+                    use_acks = False
+                elif ack[CHUNK_ACK_STATUS_OFFSET] not in CHUNK_ACK_STATUS_OK:
+                    raise TransferRejected(f"chunk {i + 1} of {total} was rejected by the device: {ack.hex()}")
+                else:
+                    self.logging.debug(f"chunk {i + 1} of {total} acknowledged: {ack.hex()}")
+            sent_byte_count += sum(len(ble_packet) for ble_packet in packet)
+
+        if response and sent_byte_count >= UPLOAD_RATE_MIN_BYTES:
+            elapsed = time.monotonic() - started - paused
+            if elapsed > 0:
+                self._upload_bytes_per_second = sent_byte_count / elapsed
+                self.logging.debug(f"upload rate: {self._upload_bytes_per_second:.0f} bytes/s")
+
+    async def _write_with_retry(self, ble_packet: bytearray | bytes, response: bool, label: str) -> None:
+        """
+        Writes a single BLE packet, retrying transient write errors with an increasing back-off.
+        Args:
+            ble_packet (bytearray | bytes): The packet to write.
+            response (bool): Whether to use a write-with-response operation.
+            label (str): Position of the packet in the transfer, used for logging.
+        """
         MAX_RETRIES = 3
 
-        for i, packet in enumerate(packets):
-            for j, ble_paket in enumerate(packet):
-                if i > 0 or j > 0:
-                    await asyncio.sleep(PACKET_DELAY_S)
-                self.logging.debug(f"sending packet {i + 1}.{j + 1} of {len(packets)}.{len(packets[-1])}")
-                wait_for_response = response if j == len(packet) - 1 else False
-
-                for attempt in range(MAX_RETRIES + 1):
-                    try:
-                        await self.client.write_gatt_char(
-                            char_specifier=UUID_CHARACTERISTIC_WRITE_DATA,
-                            data=ble_paket,
-                            response=wait_for_response
-                        )
-                        break
-                    except BleakDBusError as e:
-                        err_str = str(e).lower()
-                        is_retryable = (
-                            ("0x0e" in err_str or "failed" in err_str or "failed to initiate write" in err_str)
-                            and attempt < MAX_RETRIES
-                        )
-                        if is_retryable:
-                            self.logging.warning(
-                                "BLE write error on packet %d.%d, retry %d/%d: %s",
-                                i + 1, j + 1, attempt + 1, MAX_RETRIES, e,
-                            )
-                            await asyncio.sleep(0.5 * (attempt + 1))
-                        else:
-                            raise
-                if wait_for_response:
-                    try:
-                        response_data = await self.client.read_gatt_char(UUID_READ_DATA)
-                        self.logging.debug(f"received response data: {response_data}")
-                    except BleakDBusError as e:
-                        if e.dbus_error == "org.bluez.Error.NotPermitted":
-                            pass
-                        else:
-                            self.logging.error(f"error while reading response data: {e}")
-                    except Exception as e:
-                        self.logging.error(f"error while reading response data: {e}")
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                await self.client.write_gatt_char(
+                    char_specifier=UUID_CHARACTERISTIC_WRITE_DATA,
+                    data=ble_packet,
+                    response=response
+                )
+                return
+            except BleakDBusError as e:
+                if self._is_retryable_write_error(e) and attempt < MAX_RETRIES:
+                    self.logging.warning(
+                        "BLE write error on packet %s, retry %d/%d: %s",
+                        label, attempt + 1, MAX_RETRIES, e,
+                    )
+                    await asyncio.sleep(0.5 * (attempt + 1))
+                else:
+                    raise
 
-    async def get_max_bytes_per_chunk(self, response: bool) -> int:
+    def get_ble_packet_size(self, response: bool) -> int:
+        """
+        Returns the largest payload that fits into a single GATT write on this link.
+        Args:
+            response (bool): Whether the packet will be written with response, which is limited to 512 bytes.
+        Returns:
+            int: The ATT MTU minus the ATT header, or the size for FALLBACK_ATT_MTU if the MTU is not known yet.
+        """
+        packet_size = (self._mtu or FALLBACK_ATT_MTU) - ATT_HEADER_SIZE
         if response:
-            # Maximum write size with response is limited to 512 bytes
-            # see: https://bleak.readthedocs.io/en/latest/api/client.html#bleak.BleakClient.write_gatt_char
-            return 512
-        else:
-            if self._ble_packet_size is None:
-                char = self.client.services.get_characteristic(UUID_CHARACTERISTIC_WRITE_DATA)
-                if char.max_write_without_response_size != 20:
-                    self._ble_packet_size = char.max_write_without_response_size
-                else:
-                    # my 64x64 device reports a max_write_without_response_size of 514 bytes, most of the time
-                    self._ble_packet_size = 514
+            packet_size = min(packet_size, MAX_ATTRIBUTE_VALUE_SIZE)
+        return packet_size
 
-        return self._ble_packet_size
+    async def get_max_bytes_per_chunk(self, response: bool) -> int:
+        return self.get_ble_packet_size(response)
 
-    async def read(self) -> bytes:
+    async def read(self, timeout: float = 5.0) -> bytes:
+        """
+        Reads the next frame sent by the device.
+        The read characteristic (fa03) only supports notify, so this waits for a notification instead of issuing a GATT read.
+        Args:
+            timeout (float): Maximum time to wait, in seconds.
+        Raises:
+            TimeoutError: If no frame is received in time.
+        """
         if not self.is_connected():
             await self.connect()
-        data = await self.client.read_gatt_char(UUID_READ_DATA)
+        data = await self.wait_for_notification(timeout)
+        if data is None:
+            raise TimeoutError(f"no data received from {self.address} within {timeout}s")
         self.logging.info("data received")
         return data
 
@@ -385,6 +1097,8 @@ class ConnectionManager:
             return
 
         self._connected = False
+        self._notifications_enabled = False
+        self._release_connection_slot()
         self.logging.info(f"disconnected from {client.address}")
         for listener in self._connection_listeners:
             if listener.on_disconnected:
@@ -21,6 +21,17 @@ UUID_CHARACTERISTIC_WRITE_DATA = "0000fa02-0000-1000-8000-00805f9b34fb"
 UUID_READ_DATA = "0000fa03-0000-1000-8000-00805f9b34fb"
 UUID_NOTIFY = "d44bc439-abfd-45a2-b575-925416129601"
 
+UUID_CHARACTERISTIC_AE01 = "0000ae01-0000-1000-8000-00805f9b34fb"
+UUID_CHARACTERISTIC_AE02 = "0000ae02-0000-1000-8000-00805f9b34fb"
+
+# Characteristics whose handles make up the service layout validated when reusing cached services
+SERVICE_LAYOUT_CHARACTERISTICS = (
+    UUID_CHARACTERISTIC_WRITE_DATA,
+    UUID_READ_DATA,
+    UUID_CHARACTERISTIC_AE01,
+    UUID_CHARACTERISTIC_AE02,
+)
+
 UUID_SERVICE_DEVICE_PROPERTY = "00001800-0000-1000-8000-00805f9b34fb"
 UUID_CHARACTERISTIC_DEVICE_PROPERTY = "00002a00-0000-1000-8000-00805f9b34fb"
 
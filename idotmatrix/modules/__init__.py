@@ -1,8 +1,19 @@
-from asyncio import sleep
-from typing import List
+from collections.abc import AsyncIterable
+from typing import Any, Awaitable, Callable, List, Optional
 
 from ..connection_manager import ConnectionManager
 
+# Time the device needs to process a command it doesn't acknowledge, by command and subcommand byte.
+# Only for delays measured on hardware, all others use the default.
+COMMAND_SETTLE_DELAYS_S: dict[bytes, float] = {}
+DEFAULT_SETTLE_DELAY_S = 0.5
+
+
+def _command_of(data: bytearray | bytes) -> bytes:
+    """Returns the command and subcommand bytes that identify the type of a packet."""
+    return bytes(data[2:4])
+
+
 class IDotMatrixModule:
 
     def __init__(
@@ -26,33 +37,52 @@ class IDotMatrixModule:
         Args:
             data (bytearray | bytes): The data to send.
             response (bool, optional): Whether to expect a response from the device. Defaults to False.
-            sleep_after (float, optional): Time to wait after sending the data. Defaults to 0 if response=True and 0.5 seconds if response=False.
+            sleep_after (float, optional): Maximum time to wait for the device to process the command, see
+                _wait_for_completion. Defaults to 0 if response=True and the settle delay of the command otherwise.
         """
         if sleep_after is None:
-            sleep_after = 0 if response else 0.5
+            sleep_after = 0 if response else COMMAND_SETTLE_DELAYS_S.get(_command_of(data), DEFAULT_SETTLE_DELAY_S)
 
         await self._connection_manager.send_bytes(data=data, response=response)
+        await self._wait_for_completion(_command_of(data), sleep_after)
+
+    async def _wait_for_completion(self, command: bytes, sleep_after: float):
+        """
+        Sometimes the device needs a moment to process a command before it is able to receive the next one.
+        Waits until the device acknowledges the command, or for sleep_after if it doesn't acknowledge it.
+        """
         if sleep_after > 0:
-            # sometimes the device needs a moment to process the command before it is able to receive the next one
-            await sleep(sleep_after)
+            await self._connection_manager.wait_for_command_completion(command, sleep_after)
 
     async def _send_packets(
         self,
-        packets: List[List[bytearray | bytes]],
+        packets: List[List[bytearray | bytes]] | AsyncIterable[List[bytearray | bytes]],
         response: bool = False,
-        sleep_after: float = None
+        sleep_after: float = None,
+        should_abort: Optional[Callable[[], bool]] = None,
+        between_packets: Optional[Callable[[], Awaitable[Any]]] = None,
     ):
         """
         Sends multiple packets to the IDotMatrix device.
         Args:
-            packets (List[List[bytearray | bytes]]): The packets to send.
+            packets (List[List[bytearray | bytes]] | AsyncIterable[List[bytearray | bytes]]): The packets to send,
+                or an async iterable producing them lazily.
             response (bool, optional): Whether to expect a response from the device. Defaults to False.
-            sleep_after (float, optional): Time to wait after sending the packets. Defaults to 0 if response=True and 0.5 seconds if response=False.
+            sleep_after (float, optional): Maximum time to wait for the device to process the command, see
+                _wait_for_completion. Defaults to 0 if response=True and the settle delay of the command otherwise.
+            should_abort (Callable[[], bool], optional): Checked between packets, see ConnectionManager.send_packets.
+            between_packets (Callable[[], Awaitable[Any]], optional): Awaited between packets, see ConnectionManager.send_packets.
         """
+        command = b""
+        if not isinstance(packets, AsyncIterable) and packets and packets[0]:
+            command = _command_of(packets[0][0])
         if sleep_after is None:
-            sleep_after = 0 if response else 0.5
+            sleep_after = 0 if response else COMMAND_SETTLE_DELAYS_S.get(command, DEFAULT_SETTLE_DELAY_S)
 
-        await self._connection_manager.send_packets(packets=packets, response=response)
-        if sleep_after > 0:
-            # sometimes the device needs a moment to process the command before it is able to receive the next one
-            await sleep(sleep_after)
\ No newline at end of file
+        await self._connection_manager.send_packets(
+            packets=packets,
+            response=response,
+            should_abort=should_abort,
+            between_packets=between_packets,
+        )
+        await self._wait_for_completion(command, sleep_after)
\ No newline at end of file
@@ -48,6 +48,8 @@ class CommonModule(IDotMatrixModule):
             ]
         )
         await self._send_bytes(data=data)
+
+    async def flip_screen(self, flip: bool = True):
         """
         Rotates the screen 180 degrees.
 
@@ -64,6 +66,8 @@ class CommonModule(IDotMatrixModule):
             ]
         )
         await self._send_bytes(data=data, response=True)
+
+    async def reset(self):
         """
         Sends a command that resets the device and its internals.
         Can fix issues that appear over time.
@@ -1,9 +1,11 @@
 import asyncio
 import binascii
+import dataclasses
 import io
 import logging
 from os import PathLike
-from typing import List, Tuple
+from collections.abc import AsyncIterable, AsyncIterator
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
 
 from PIL import Image as PILImage
 
@@ -12,6 +14,8 @@ from . import IDotMatrixModule
 from ..screensize import ScreenSize
 from ..util import color_utils
 from ..util import image_utils
+from ..util import packet_utils
+from ..util.gif_cache import EncodedGif, GifCache, file_digest, make_key
 from ..util.image_utils import ResizeMode
 
 ANIMATION_MAX_FRAME_COUNT = 64  # Maximum number of frames in a GIF animation
@@ -20,9 +24,20 @@ DEFAULT_DURATION_PER_FRAME_MS = 200  # Default duration per frame in millisecond
 ANIMATION_TOTAL_DURATION_LIMIT_MS = 10000  # 10 seconds
 DEFAULT_ANIMATION_TOTAL_DURATION_MS = ANIMATION_TOTAL_DURATION_LIMIT_MS
 
+# Assumed upload rate until one has been measured on the link, see ConnectionManager.upload_bytes_per_second
+DEFAULT_UPLOAD_BYTES_PER_SECOND = 4000
+# Reduction steps to fit a payload budget, palette size and frame count are reduced in turn until the GIF fits.
+# Fewer frames don't change the playback speed, the kept frames are shown longer.
+BUDGET_PALETTE_COLORS = (128, 64, 32, 16)
+BUDGET_FRAME_COUNTS = (48, 32, 24, 16, 8)
+
 # --- Constants based on the Java code ---
 CHUNK_SIZE_4096 = 4096
 HEADER_SIZE_GIF = 16  # As per sendImageData logic in GifAgreement.java
+BLE_PACKET_SIZE_NO_MTU = 18  # As per getSendData in GifAgreement.java, for devices without MTU support
+
+GIF_TYPE_DIY_ANIMATION = 13
+GIF_TYPE_NO_TIME_SIGNATURE = 12
 
 
 class GifModule(IDotMatrixModule):
@@ -35,9 +50,11 @@ class GifModule(IDotMatrixModule):
         self,
         connection_manager: ConnectionManager,
         screen_size: ScreenSize,
+        gif_cache: Optional[GifCache] = None,
     ) -> None:
         super().__init__(connection_manager=connection_manager)
         self.screen_size = screen_size
+        self._gif_cache = gif_cache
 
     async def upload_gif_file(
         self,
@@ -46,7 +63,13 @@ class GifModule(IDotMatrixModule):
         palletize: bool = True,
         background_color: Tuple[int, int, int] or int or str = (0, 0, 0),
         duration_per_frame_in_ms: int = None,
-    ):
+        global_palette: bool = False,
+        palette_colors: int = 256,
+        delta_frames: bool = False,
+        duplicate_frame_threshold: int = 0,
+        max_payload_bytes: Optional[int] = None,
+        max_upload_seconds: Optional[float] = None,
+    ) -> EncodedGif:
         """
         Uploads a GIF file to the device.
 
@@ -57,38 +80,285 @@ class GifModule(IDotMatrixModule):
                 high detail (like photos) but good for pixel-art or other content with high contrasts. Defaults to True.
             background_color (Tuple[int, int, int]): RGB color to fill transparent pixels. Defaults to black (0, 0, 0).
             duration_per_frame_in_ms (int, optional): Duration of each frame in milliseconds. If not provided, defaults to the duration specified in the GIF file, or 200ms if not set.
+            global_palette (bool): Whether to palletize all frames with one palette built from all of them, instead of
+                one palette per frame. Saves the per-frame color tables and usually compresses better. Defaults to False.
+            palette_colors (int): Number of colors of the palette(s) when palletizing. Defaults to 256.
+            delta_frames (bool): Whether frames only replace the previous one where it changed, instead of
+                the whole canvas. Much smaller for animations with large static areas. Combined with global_palette,
+                unchanged pixels within the changed region are also made transparent, which reserves one palette
+                color. Defaults to False.
+            duplicate_frame_threshold (int): Consecutive frames whose pixels differ by at most this much in every color
+                channel (0-255) are merged into one frame shown for their summed duration. Defaults to 0, which only
+                merges identical frames.
+            max_payload_bytes (int, optional): Maximum size of the encoded GIF. If it is larger, the palette size and
+                frame count are reduced step by step until it fits. Frames are skipped without changing the total
+                duration of the animation. Defaults to no limit.
+            max_upload_seconds (float, optional): Maximum time the upload should take, converted to a payload size
+                with the upload rate last measured on the link. Combined with max_payload_bytes, the lower limit wins.
+                Defaults to no limit.
+        Returns:
+            EncodedGif: The uploaded GIF, its settings tell which options were reduced to fit the limits, if any.
+        """
+        encoding = asyncio.create_task(self.encode_gif_file(
+            file_path=file_path,
+            resize_mode=resize_mode,
+            palletize=palletize,
+            background_color=background_color,
+            duration_per_frame_in_ms=duration_per_frame_in_ms,
+            global_palette=global_palette,
+            palette_colors=palette_colors,
+            delta_frames=delta_frames,
+            duplicate_frame_threshold=duplicate_frame_threshold,
+            max_payload_bytes=max_payload_bytes,
+            max_upload_seconds=max_upload_seconds,
+        ))
+        try:
+            # the connection doesn't depend on the GIF, establish it while the GIF is being encoded
+            await self._connect()
+        except BaseException:
+            encoding.cancel()
+            raise
+        await self.upload_gif_packets(self.iter_upload_packets(encoding))
+        return encoding.result()
+
+    async def encode_gif_file(
+        self,
+        file_path: PathLike | str,
+        resize_mode: ResizeMode = ResizeMode.FIT,
+        palletize: bool = True,
+        background_color: Tuple[int, int, int] or int or str = (0, 0, 0),
+        duration_per_frame_in_ms: int = None,
+        global_palette: bool = False,
+        palette_colors: int = 256,
+        delta_frames: bool = False,
+        duplicate_frame_threshold: int = 0,
+        max_payload_bytes: Optional[int] = None,
+        max_upload_seconds: Optional[float] = None,
+    ) -> EncodedGif:
+        """
+        Loads an image file and encodes it as a GIF that fits the screen of the device.
+        The result only depends on the file, the arguments and the screen size, so it can be shared between devices
+        with the same screen size. If the module has a GIF cache, the result is looked up by the file content and
+        the arguments first. See upload_gif_file for the arguments.
+
+        Returns:
+            EncodedGif: The encoded GIF data and its CRC32, and the options reduced to fit the limits, if any.
         """
         screen_width = self.screen_size.value[0]  # assuming square canvas, so width == height
         background_color = color_utils.parse_color_rgb(background_color)
+        payload_budget = self.payload_budget(max_payload_bytes, max_upload_seconds)
 
         # Run blocking file I/O in thread pool to avoid blocking the event loop
-        gif_data = await asyncio.to_thread(
-            self._load_gif_and_adapt_to_canvas,
+        return await asyncio.to_thread(
+            self._encode_gif_file_within_budget,
+            max_payload_bytes=payload_budget,
             file_path=file_path,
             canvas_size=screen_width,
             resize_mode=resize_mode,
             palletize=palletize,
             background_color=background_color,
             duration_per_frame_in_ms=duration_per_frame_in_ms,
+            global_palette=global_palette,
+            palette_colors=palette_colors,
+            delta_frames=delta_frames,
+            duplicate_frame_threshold=duplicate_frame_threshold,
+            max_frame_count=ANIMATION_MAX_FRAME_COUNT,
         )
 
+    def payload_budget(
+        self,
+        max_payload_bytes: Optional[int] = None,
+        max_upload_seconds: Optional[float] = None,
+    ) -> Optional[int]:
+        """
+        Returns the maximum size of an encoded GIF for the given limits, or None if there is no limit.
+
+        Args:
+            max_payload_bytes (int, optional): Maximum size of the encoded GIF.
+            max_upload_seconds (float, optional): Maximum time the upload should take. Converted with the upload rate
+                last measured on the link, or DEFAULT_UPLOAD_BYTES_PER_SECOND before one has been measured.
+        """
+        budgets = []
+        if max_payload_bytes is not None:
+            budgets.append(max_payload_bytes)
+        if max_upload_seconds is not None:
+            upload_rate = self._connection_manager.upload_bytes_per_second or DEFAULT_UPLOAD_BYTES_PER_SECOND
+            budgets.append(int(max_upload_seconds * upload_rate))
+        return min(budgets) if budgets else None
+
+    def _encode_gif_file_within_budget(self, max_payload_bytes: Optional[int], **options: Any) -> EncodedGif:
+        """
+        Encodes a GIF file like _encode_gif_file_cached. If the result is larger than max_payload_bytes, the palette
+        size and frame count are reduced in turn, see BUDGET_PALETTE_COLORS and BUDGET_FRAME_COUNTS, until it fits.
+        The encoder doesn't dither, so there is no dithering to reduce. Every attempt is cached on its own, so
+        encoding the same file again with another budget is cheap.
+
+        Returns:
+            EncodedGif: The first result that fits, or the one with the smallest settings if none does. Its settings are the
+                reduced options, or None if nothing had to be reduced.
+        """
+        encoded_gif = self._encode_gif_file_cached(**options)
+        if max_payload_bytes is None or len(encoded_gif.data) <= max_payload_bytes:
+            return encoded_gif
+
+        settings = None
+        for settings in self._budget_steps(options["palette_colors"], options["max_frame_count"]):
+            # the palette size only applies to palletized frames
+            options.update(palletize=True, **settings)
+            encoded_gif = self._encode_gif_file_cached(**options)
+            if len(encoded_gif.data) <= max_payload_bytes:
+                break
+        else:
+            self.logging.warning(
+                f"GIF {options['file_path']} is {len(encoded_gif.data)} bytes with the smallest settings, "
+                f"more than the budget of {max_payload_bytes} bytes"
+            )
+        if settings is not None:
+            self.logging.info(
+                f"Encoded GIF {options['file_path']} with {settings} to {len(encoded_gif.data)} bytes, "
+                f"for a budget of {max_payload_bytes} bytes"
+            )
+        return dataclasses.replace(encoded_gif, settings=settings)
+
+    @staticmethod
+    def _budget_steps(palette_colors: int, max_frame_count: int) -> Iterator[Dict[str, int]]:
+        """
+        Yields the options to try to fit a payload budget, each a step smaller than the previous one.
+        Palette size and frame count are reduced alternately, starting from the given values.
+        """
+        smaller_palette_colors = [colors for colors in BUDGET_PALETTE_COLORS if colors < palette_colors]
+        smaller_frame_counts = [count for count in BUDGET_FRAME_COUNTS if count < max_frame_count]
+        while smaller_palette_colors or smaller_frame_counts:
+            if smaller_palette_colors:
+                palette_colors = smaller_palette_colors.pop(0)
+                yield {"palette_colors": palette_colors, "max_frame_count": max_frame_count}
+            if smaller_frame_counts:
+                max_frame_count = smaller_frame_counts.pop(0)
+                yield {"palette_colors": palette_colors, "max_frame_count": max_frame_count}
+
+    def _encode_gif_file_cached(
+        self,
+        file_path: PathLike | str,
+        canvas_size: int,
+        resize_mode: ResizeMode,
+        palletize: bool,
+        background_color: Tuple[int, int, int],
+        duration_per_frame_in_ms: Optional[int],
+        global_palette: bool,
+        palette_colors: int,
+        delta_frames: bool,
+        duplicate_frame_threshold: int,
+        max_frame_count: int,
+    ) -> EncodedGif:
+        key = None
+        if self._gif_cache is not None:
+            key = make_key(
+                file_digest(file_path),
+                canvas_size,
+                resize_mode.value,
+                palletize,
+                tuple(background_color),
+                duration_per_frame_in_ms,
+                global_palette,
+                palette_colors,
+                delta_frames,
+                duplicate_frame_threshold,
+                max_frame_count,
+            )
+            encoded_gif = self._gif_cache.get(key)
+            if encoded_gif is not None:
+                self.logging.debug(f"Using cached GIF for {file_path}")
+                return encoded_gif
+
+        gif_data = self._load_gif_and_adapt_to_canvas(
+            file_path=file_path,
+            canvas_size=canvas_size,
+            resize_mode=resize_mode,
+            palletize=palletize,
+            background_color=background_color,
+            duration_per_frame_in_ms=duration_per_frame_in_ms,
+            global_palette=global_palette,
+            palette_colors=palette_colors,
+            delta_frames=delta_frames,
+            duplicate_frame_threshold=duplicate_frame_threshold,
+            max_frame_count=max_frame_count,
+        )
+        encoded_gif = EncodedGif(data=gif_data, crc32=self.calculate_crc32_java_equivalent(gif_data))
+        if self._gif_cache is not None:
+            self._gif_cache.put(key, encoded_gif)
+        return encoded_gif
+
+    @property
+    def ble_packet_size(self) -> int:
+        """Size of the BLE packets created by create_upload_packets for this device."""
+        # the last packet of every chunk is written with response
+        return self._connection_manager.get_ble_packet_size(response=True)
+
+    def create_upload_packets(self, encoded_gif: EncodedGif) -> tuple[tuple[memoryview, ...], ...]:
+        """
+        Creates the packets to upload an encoded GIF to the device.
+        The packets are read-only views into a single buffer, so they can be shared between devices with the same
+        BLE packet size.
+
+        Args:
+            encoded_gif (EncodedGif): The encoded GIF, see encode_gif_file.
+        Returns:
+            tuple[tuple[memoryview, ...], ...]: The 4K chunks with headers, each split into BLE packets.
+        """
         # TODO: although the current implementation seems to _mostly_ work,
         # some GIFs stop animating during the upload, and often times the second upload after a successful upload
         # fails completely (previous GIF is just "stuck" and the new GIF is never displayed). So there is probably some edge case
         # that is not handled correctly.
 
-        GIF_TYPE_DIY_ANIMATION = 13
-        GIF_TYPE_NO_TIME_SIGNATURE = 12
         packets = self.create_gif_data_packets(
-            gif_data=gif_data,
+            gif_data=encoded_gif.data,
             # TODO: figure out what this does
             #  this might be the index that this GIF will be stored within the device's memory :think:
             #  it doesn't seem to have an effect when sending a single GIF like it is done here though
             gif_type=GIF_TYPE_NO_TIME_SIGNATURE,
             # TODO: figure out what this does, doesn't seem to have any effect
             time_sign=1,
+            ble_packet_size=self.ble_packet_size,
+            crc32=encoded_gif.crc32,
+        )
+        return tuple(tuple(packet) for packet in packets)
+
+    async def iter_upload_packets(self, encoded_gif: Awaitable[EncodedGif]) -> AsyncIterator[tuple[memoryview, ...]]:
+        """
+        Produces the packets to upload a GIF lazily, as soon as it has been encoded.
+        The headers need the length and CRC32 of the whole GIF, so no packet is produced before encoding finished.
+
+        Args:
+            encoded_gif (Awaitable[EncodedGif]): The GIF being encoded, see encode_gif_file.
+        Returns:
+            AsyncIterator[tuple[memoryview, ...]]: The 4K chunks with headers, each split into BLE packets.
+        """
+        for packet in self.create_upload_packets(await encoded_gif):
+            yield packet
+
+    async def upload_gif_packets(
+        self,
+        packets: Sequence[Sequence[bytes | memoryview]] | AsyncIterable[Sequence[bytes | memoryview]],
+        should_abort: Optional[Callable[[], bool]] = None,
+        between_chunks: Optional[Callable[[], Awaitable[Any]]] = None,
+    ):
+        """
+        Uploads packets created by create_upload_packets to the device.
+
+        Args:
+            packets (Sequence[Sequence[bytes | memoryview]] | AsyncIterable[Sequence[bytes | memoryview]]): The packets
+                to upload, or an async iterable producing them lazily, see iter_upload_packets.
+            should_abort (Optional[Callable[[], bool]]): Checked between 4K chunks, the upload is aborted with
+                TransferAborted if it returns True.
+            between_chunks (Optional[Callable[[], Awaitable[Any]]]): Awaited between 4K chunks, f.e. to let other
+                commands run in between.
+        """
+        await self._send_packets(
+            packets=packets,
+            response=True,
+            should_abort=should_abort,
+            between_packets=between_chunks,
         )
-        await self._send_packets(packets=packets, response=True)
 
     @staticmethod
     def _convert_device_material_time(input_key: int) -> int:
@@ -118,6 +388,11 @@ class GifModule(IDotMatrixModule):
         palletize: bool = True,
         background_color: Tuple[int, int, int] = (0, 0, 0),
         duration_per_frame_in_ms: int = None,
+        global_palette: bool = False,
+        palette_colors: int = 256,
+        delta_frames: bool = False,
+        duplicate_frame_threshold: int = 0,
+        max_frame_count: int = ANIMATION_MAX_FRAME_COUNT,
     ) -> bytes:
         """
         Loads a GIF file and adapts it to the pixel size of the device's canvas.
@@ -133,6 +408,12 @@ class GifModule(IDotMatrixModule):
             palletize (bool): Whether to convert the image to a color palette. Defaults to True.
             background_color (Tuple[int, int, int]): Background color to fill transparent pixels.
             duration_per_frame_in_ms (int, optional): Duration of each frame in milliseconds. If not provided, defaults to the duration specified in the GIF file, or 200ms if not set.
+            global_palette (bool): Whether to palletize all frames with one shared palette. Defaults to False.
+            palette_colors (int): Number of colors of the palette(s) when palletizing. Defaults to 256.
+            delta_frames (bool): Whether frames only replace the changed region of the previous one. Defaults to False.
+            duplicate_frame_threshold (int): Maximum color difference of frames that are merged. Defaults to 0.
+            max_frame_count (int): Maximum number of frames, at most ANIMATION_MAX_FRAME_COUNT. Skipped frames extend the
+                kept ones, so the animation keeps its speed. Defaults to ANIMATION_MAX_FRAME_COUNT.
         Returns:
             bytes: A byte representation of the GIF file, adapted to fit the pixel size.
         """
@@ -141,6 +422,7 @@ class GifModule(IDotMatrixModule):
 
         with PILImage.open(file_path) as img:
             frames = []
+            source_durations = []
             try:
                 # There doesn't seem to be a frame limit in the app, but too many frames cause problems.
                 # To be on the safe side, we limit it to 64 frames.
@@ -158,18 +440,42 @@ class GifModule(IDotMatrixModule):
                             background_color=background_color,
                             mode="RGBA",
                         )
-                    if palletize:
-                        frame = image_utils.palettize(frame)
+                    if palletize and not global_palette:
+                        frame = image_utils.palettize(frame, colors=palette_colors)
 
                     frames.append(frame.copy())
+                    source_durations.append(img.info.get("duration"))
                     img.seek(img.tell() + 1)
             except EOFError:
                 pass
 
-            frames, duration_per_frame_in_ms = self._ensure_reasonable_frame_count(
-                img, frames, duration_per_frame_in_ms
+            durations = self._resolve_frame_durations(source_durations, duration_per_frame_in_ms)
+            # merge repeated frames first, so the frame limit only drops frames that actually show motion
+            frames, durations = self._merge_duplicate_frames(frames, durations, duplicate_frame_threshold)
+            frames, durations = self._ensure_reasonable_frame_count(
+                frames, durations, max_total_frame_count=min(max_frame_count, ANIMATION_MAX_FRAME_COUNT)
             )
 
+            transparency = None
+            save_options = {}
+            if palletize and global_palette:
+                # one palette for the frames that are actually kept, so the GIF only needs a global color table
+                use_transparency = delta_frames and len(frames) > 1
+                # with delta frames, keep one index free, it marks pixels that didn't change since the previous frame
+                palette = image_utils.build_global_palette(
+                    frames, colors=palette_colors - 1 if use_transparency else palette_colors
+                )
+                frames = [image_utils.palettize_with(frame, palette) for frame in frames]
+                palette_entries = palette.getpalette()
+                if use_transparency:
+                    # the quantizer may produce fewer colors than asked for, the free index follows the last one
+                    transparency = len(palette_entries) // 3
+                    frames = image_utils.make_unchanged_pixels_transparent(frames, transparency)
+                    save_options["transparency"] = transparency
+                    palette_entries = palette_entries + [0, 0, 0]
+                # without the palette, Pillow writes a local color table for every frame
+                save_options["palette"] = palette_entries
+
             # TODO: there are still some cases where
             #  - the GIF is not animating all frames
 
@@ -178,12 +484,16 @@ class GifModule(IDotMatrixModule):
             frames[0].save(
                 gif_buffer,
                 format="GIF",
+                **save_options,
                 save_all=True,
                 optimize=True,  # setting this to False fails the transfer for some reason
                 append_images=frames[1:],
                 loop=0,  # loop forever
-                duration=duration_per_frame_in_ms,
-                disposal=2,  # Restore to background color after each frame
+                duration=durations,
+                # Restore to background color after each frame, so every frame covers the whole canvas.
+                # With delta frames, the previous frame is kept instead, and only the rectangle that changed
+                # since the previous frame is stored for each frame.
+                disposal=1 if delta_frames else 2,
             )
             gif_buffer.seek(0)
             return gif_buffer.getvalue()
@@ -196,30 +506,15 @@ class GifModule(IDotMatrixModule):
         """Converts a short (2 bytes) to a little-endian bytearray."""
         return bytearray(value.to_bytes(2, byteorder='little'))
 
-    def _chunk_data_by_size(self, data: bytes, chunk_size: int) -> list[bytearray]:
-        """
-        Chunks data into smaller pieces of a specified size.
-        Corresponds to getSendData4096.
-        """
-        if not data:
-            return []
-
-        chunks = []
-        num_chunks = (len(data) + chunk_size - 1) // chunk_size  # Ceiling division
-
-        for i in range(num_chunks):
-            start = i * chunk_size
-            end = min((i + 1) * chunk_size, len(data))
-            chunks.append(bytearray(data[start:end]))
-        return chunks
-
     def create_gif_data_packets(
         self,
         gif_data: bytes,
         gif_type: int,
         time_sign: int,  # Assuming this is the raw time signature before DeviceMaterialTimeConvert.ConvertTime
-        ble_device_mtu_enabled: bool = True
-    ) -> list[list[bytearray]]:
+        ble_device_mtu_enabled: bool = True,
+        ble_packet_size: int = None,
+        crc32: int = None,
+    ) -> list[list[memoryview]]:
         """
         Creates packets for sending GIF data, mirroring the Java GifAgreement logic.
 
@@ -228,96 +523,65 @@ class GifModule(IDotMatrixModule):
             gif_type: The type parameter (e.g., 12 or other values from sendImageData). Values up until 19 display an image on the device.
             time_sign: 0: "0", 1: "10", 2: "30", 3: "60", 4: "300", else: "5".
             ble_device_mtu_enabled: Boolean indicating if MTU is enabled on the BLE device.
+            ble_packet_size: Size of the BLE packets. Defaults to the payload size of the negotiated MTU if
+                ble_device_mtu_enabled is set, or 18 bytes otherwise.
+            crc32: The CRC32 of gif_data, if already known. Computed from gif_data if not set.
 
         Returns:
-            A list of lists of byte arrays. The outer list represents "4K chunks with headers",
+            A list of lists of read-only views into one buffer. The outer list represents "4K chunks with headers",
             and the inner lists contain the actual BLE packets for each of those chunks.
         """
-        send_data_3 = []
-
         if not gif_data:
             raise ValueError("gif_data cannot be empty or None.")
 
+        if ble_packet_size is None:
+            if ble_device_mtu_enabled:
+                # the last packet of every chunk is written with response
+                ble_packet_size = self._connection_manager.get_ble_packet_size(response=True)
+            else:
+                ble_packet_size = BLE_PACKET_SIZE_NO_MTU
+
         # Calculate CRC32 for the entire GIF data
         # Ensure this CRC32 matches the Java CrcUtils.CRC32.CRC32 implementation
-        crc32_val = self.calculate_crc32_java_equivalent(gif_data)
+        crc32_val = crc32 if crc32 is not None else self.calculate_crc32_java_equivalent(gif_data)
         crc32_bytes = self._int_to_bytes_le(crc32_val)  # Little-endian int (4 bytes)
 
         # Get the total length of the GIF data as bytes
         total_length_bytes = self._int_to_bytes_le(len(gif_data))  # Little-endian int (4 bytes)
 
-        # 1. Chunk the gif_data into 4096-byte chunks
-        chunks_4096 = self._chunk_data_by_size(gif_data, CHUNK_SIZE_4096)
-
-        processed_large_packets_with_headers = []
-        for i, current_chunk in enumerate(chunks_4096):
-            packet_data_length = len(current_chunk) + HEADER_SIZE_GIF
-            packet_data_length_bytes_be = bytearray(self._int_to_bytes_le(packet_data_length))
-
-            header = bytearray(HEADER_SIZE_GIF)
-
-            header[0] = packet_data_length_bytes_be[0]  # Packet Length (Big Endian short)
-            header[1] = packet_data_length_bytes_be[1]
-            header[2] = 1  # Command or type (fixed value from sendImageData)
-            header[3] = 0  # Sub-command or subtype (fixed value)
-
-            if i > 0:
-                header[4] = 2  # Continuation packet
-            else:
-                header[4] = 0  # First packet
-
-            # Total GIF data length (Little Endian int)
-            header[5:9] = total_length_bytes[0:4]
-
-            # CRC32 of GIF data (Little Endian int)
-            header[9:13] = crc32_bytes[0:4]
-
-            # Time signature or fixed bytes based on 'gif_type'
-            if gif_type == 12:  # Assuming 12 is a special type
-                header[13] = 0
-                header[14] = 0
-            else:
-                # Java: DeviceMaterialTimeConvert.ConvertTime(AppData.getInstance().getTimeSign())
-                # 'time_sign' passed to create_gif_data_packets is the input_key
-                converted_time_value = self._convert_device_material_time(time_sign)  # time_sign is the key (0,1,2,3,4...)
-
-                time_sign_bytes_be = bytearray(converted_time_value.to_bytes(2, byteorder='big'))
-                header[13] = time_sign_bytes_be[0]
-                header[14] = time_sign_bytes_be[1]
-
-            header[15] = gif_type & 0xFF  # Ensure it's a byte
-
-            large_packet_with_header = bytes(header) + current_chunk
-            processed_large_packets_with_headers.append(large_packet_with_header)
-
-        # 3. Split each "large packet with header" into smaller BLE packets
-        for i, large_packet in enumerate(processed_large_packets_with_headers):
-            ble_packets_for_chunk = self._create_ble_packets(large_packet, ble_device_mtu_enabled)
-            if ble_packets_for_chunk:
-                send_data_3.append(ble_packets_for_chunk)
-
-        return send_data_3
-
-    @staticmethod
-    def _create_ble_packets(data_packet: bytes, ble_device_mtu_enabled: bool = True) -> list[bytearray]:
-        """
-        Splits a single data packet into smaller packets suitable for BLE transmission.
-        Corresponds to getSendData.
-        MTU values (509, 18) are from GifAgreement.java.
-        """
-        if not data_packet:
-            return []
-
-        ble_packets = []
-        mtu_packet_size = 509 if ble_device_mtu_enabled else 18
-
-        num_ble_packets = (len(data_packet) + mtu_packet_size - 1) // mtu_packet_size
-
-        for i in range(num_ble_packets):
-            start = i * mtu_packet_size
-            end = min((i + 1) * mtu_packet_size, len(data_packet))
-            ble_packets.append(bytearray(data_packet[start:end]))
-        return ble_packets
+        header = bytearray(HEADER_SIZE_GIF)
+        # Packet length and first/continuation flag (bytes 0, 1 and 4) are set per chunk
+        header[2] = 1  # Command or type (fixed value from sendImageData)
+        header[3] = 0  # Sub-command or subtype (fixed value)
+
+        # Total GIF data length (Little Endian int)
+        header[5:9] = total_length_bytes[0:4]
+
+        # CRC32 of GIF data (Little Endian int)
+        header[9:13] = crc32_bytes[0:4]
+
+        # Time signature or fixed bytes based on 'gif_type'
+        if gif_type == 12:  # Assuming 12 is a special type
+            header[13] = 0
+            header[14] = 0
+        else:
+            # Java: DeviceMaterialTimeConvert.ConvertTime(AppData.getInstance().getTimeSign())
+            # 'time_sign' passed to create_gif_data_packets is the input_key
+            converted_time_value = self._convert_device_material_time(time_sign)  # time_sign is the key (0,1,2,3,4...)
+
+            time_sign_bytes_be = bytearray(converted_time_value.to_bytes(2, byteorder='big'))
+            header[13] = time_sign_bytes_be[0]
+            header[14] = time_sign_bytes_be[1]
+
+        header[15] = gif_type & 0xFF  # Ensure it's a byte
+
+        # Chunk the gif_data into 4096-byte chunks with headers and split each into smaller BLE packets
+        return packet_utils.create_chunked_packets(
+            payload=gif_data,
+            header=header,
+            ble_packet_size=ble_packet_size,
+            chunk_size=CHUNK_SIZE_4096,
+        )
 
     # --- Placeholder for a CRC32 function ---
     # The Java code uses CrcUtils.CRC32.CRC32. Python's built-in binascii.crc32
@@ -340,74 +604,125 @@ class GifModule(IDotMatrixModule):
         return crc
 
     @staticmethod
-    def _ensure_reasonable_frame_count(
-        img: PILImage.Image,
-        frames: List[PILImage.Image],
+    def _resolve_frame_durations(
+        source_durations: List[Optional[int]],
         duration_per_frame_in_ms: int = None,
         default_total_duration: int = DEFAULT_ANIMATION_TOTAL_DURATION_MS,
         default_duration_per_frame: int = DEFAULT_DURATION_PER_FRAME_MS,
         total_duration_limit_ms: int = ANIMATION_TOTAL_DURATION_LIMIT_MS,
         max_total_frame_count: int = ANIMATION_MAX_FRAME_COUNT,
-    ) -> Tuple[List[PILImage.Image], int]:
+    ) -> List[int]:
         """
-        The device can only handle a limited number of frames in a GIF animation, due to limited processing power and memory.
-        This function ensures that the number of frames does not exceed the maximum allowed frames (64) and adjusts the duration per frame if necessary.
+        Determines how long each frame is shown.
 
         Args:
-            img (PILImage.Image): The image object of the GIF.
-            frames (List[PILImage.Image]): List of frames in the GIF.
+            source_durations (List[Optional[int]]): Duration of each frame as specified in the GIF file, None if not set.
             duration_per_frame_in_ms (int, optional): Duration of each frame in milliseconds. If not provided, defaults to the duration specified in the GIF file, or 200ms if not set.
         Returns:
-            Tuple[List[PILImage.Image], int]: A tuple containing the list of frames and the duration per frame in milliseconds.
-        """
-        # determine the optimal duration per frame if not provided
-        if duration_per_frame_in_ms is None:
-            duration_per_frame_in_ms = img.info.get("duration", default_duration_per_frame)
-            # if the value we get is not reasonable, compute alternative value
-            if (
-                not isinstance(duration_per_frame_in_ms, int)
-                or not duration_per_frame_in_ms
-                or duration_per_frame_in_ms <= 0
-            ):
-                if len(frames) > max_total_frame_count:
-                    # if the number of frames exceeds the maximum allowed frames, set the duration so that exactly max_total_frame_count frames fit into the total duration limit
-                    duration_per_frame_in_ms = total_duration_limit_ms / max_total_frame_count
-                else:
-                    # compute the duration per frame based on the number of frames and the default total duration
-                    duration_per_frame_in_ms = default_total_duration / len(frames)
-
-            if duration_per_frame_in_ms < 16:
-                # make sure the duration is at least 16ms (60fps), otherwise the device might not be able to handle it
-                duration_per_frame_in_ms = 16
-
-        # make sure the duration of the full animation doesn't exceed (duration_per_frame_in_ms * 64)
-        # because otherwise the upload takes a very long time. If using the given duration_per_frame_in_ms exceeds the limit,
-        # intermediate frames are skipped to keep the total count of frames below max_total_frame_count.
-        original_frame_count = len(frames)
-        original_duration = original_frame_count * duration_per_frame_in_ms
-        if original_duration > total_duration_limit_ms:
-            # if the total duration limit is exceeded, skip frames (except for the first and last one) to stay within the limit
-            result_frames = [frames[0], frames[-1]]  # always keep the first and last frame
+            List[int]: The duration of each frame in milliseconds.
+        """
+        if duration_per_frame_in_ms is not None:
+            return [duration_per_frame_in_ms] * len(source_durations)
+
+        if len(source_durations) > max_total_frame_count:
+            # if the number of frames exceeds the maximum allowed frames, set the duration so that exactly max_total_frame_count frames fit into the total duration limit
+            fallback_duration = total_duration_limit_ms // max_total_frame_count
+        else:
+            # compute the duration per frame based on the number of frames and the default total duration
+            fallback_duration = default_total_duration // max(len(source_durations), 1)
+
+        durations = []
+        for duration in source_durations:
+            if duration is None:
+                duration = default_duration_per_frame
+            # if the value we get is not reasonable, use the alternative value
+            elif not isinstance(duration, (int, float)) or duration <= 0:
+                duration = fallback_duration
+            # make sure the duration is at least 16ms (60fps), otherwise the device might not be able to handle it
+            durations.append(max(int(duration), 16))
+        return durations
+
+    @staticmethod
+    def _merge_duplicate_frames(
+        frames: List[PILImage.Image],
+        durations: List[int],
+        threshold: int = 0,
+    ) -> Tuple[List[PILImage.Image], List[int]]:
+        """
+        Merges runs of consecutive frames that look the same into one frame, shown for the summed duration of the run.
+        GIFs often repeat a frame to hold it longer, these would otherwise use up the frame limit and upload size.
+
+        Args:
+            frames (List[PILImage.Image]): List of frames in the GIF.
+            durations (List[int]): Duration of each frame in milliseconds.
+            threshold (int): Maximum difference of any color channel of any pixel for frames to count as the same.
+        Returns:
+            Tuple[List[PILImage.Image], List[int]]: The remaining frames and their durations.
+        """
+        result_frames = frames[:1]
+        result_durations = durations[:1]
+        for frame, duration in zip(frames[1:], durations[1:]):
+            # compare with the first frame of the run, so small differences can't add up over a slow fade
+            if image_utils.max_pixel_difference(result_frames[-1], frame) <= threshold:
+                result_durations[-1] += duration
+            else:
+                result_frames.append(frame)
+                result_durations.append(duration)
+
+        if len(result_frames) < len(frames):
+            logging.debug(f"GIF merged {len(frames) - len(result_frames)} duplicate frames")
+        return result_frames, result_durations
 
-            number_of_frames_to_keep = int(
-                total_duration_limit_ms / duration_per_frame_in_ms) - 2  # -2 because we keep the first and last frame
-            number_of_frames_to_keep = min(max_total_frame_count - 2, number_of_frames_to_keep)
+    @staticmethod
+    def _evenly_spaced_indices(frame_count: int, number_of_frames_to_keep: int) -> List[int]:
+        """
+        Returns the indices of number_of_frames_to_keep evenly spaced frames, always including the first and last one.
+        """
+        number_of_frames_to_keep = max(number_of_frames_to_keep, 2)
+        if number_of_frames_to_keep >= frame_count:
+            return list(range(frame_count))
+        return [
+            round(i * (frame_count - 1) / (number_of_frames_to_keep - 1))
+            for i in range(number_of_frames_to_keep)
+        ]
 
-            if number_of_frames_to_keep >= original_frame_count:
-                # if the number of frames to keep is greater than or equal to the available frames, do nothing
-                return frames, duration_per_frame_in_ms
+    @staticmethod
+    def _ensure_reasonable_frame_count(
+        frames: List[PILImage.Image],
+        durations: List[int],
+        total_duration_limit_ms: int = ANIMATION_TOTAL_DURATION_LIMIT_MS,
+        max_total_frame_count: int = ANIMATION_MAX_FRAME_COUNT,
+    ) -> Tuple[List[PILImage.Image], List[int]]:
+        """
+        The device can only handle a limited number of frames in a GIF animation, due to limited processing power and memory.
+        This function ensures that the animation doesn't exceed the total duration limit, by skipping frames so it plays faster,
+        and that the number of frames does not exceed the maximum allowed frames (64), by skipping frames and showing the kept ones longer.
 
-            frames_excluding_first_and_last = frames[1:-1]
-            # evenly select number_of_frames_to_keep frames from frames_excluding_first_and_last and insert them into result_frames between the first and last frame
-            step = len(frames_excluding_first_and_last) // number_of_frames_to_keep
-            for i in range(0, len(frames_excluding_first_and_last), step):
-                if len(result_frames) < max_total_frame_count - 1:
-                    result_frames.insert(-1, frames_excluding_first_and_last[i])
-            frames = result_frames
+        Args:
+            frames (List[PILImage.Image]): List of frames in the GIF.
+            durations (List[int]): Duration of each frame in milliseconds.
+        Returns:
+            Tuple[List[PILImage.Image], List[int]]: A tuple containing the list of frames and the duration of each of them in milliseconds.
+        """
+        original_frame_count = len(frames)
+        original_duration = sum(durations)
+        if original_duration > total_duration_limit_ms:
+            # make sure the duration of the full animation doesn't exceed the limit, because otherwise the upload takes
+            # a very long time. Intermediate frames are skipped, so the animation plays faster.
+            average_duration = original_duration / original_frame_count
+            indices = GifModule._evenly_spaced_indices(len(frames), int(total_duration_limit_ms / average_duration))
+            frames = [frames[i] for i in indices]
+            durations = [durations[i] for i in indices]
+
+        if len(frames) > max_total_frame_count:
+            # skip intermediate frames to stay within the frame limit. Every kept frame is shown for the duration of the
+            # frames skipped after it, so the animation keeps its speed.
+            indices = GifModule._evenly_spaced_indices(len(frames), max_total_frame_count)
+            durations = [sum(durations[start:end]) for start, end in zip(indices, indices[1:] + [len(frames)])]
+            frames = [frames[i] for i in indices]
 
         logging.debug(f"GIF original frame count: {original_frame_count}")
         logging.debug(f"GIF adjusted frame count: {len(frames)}")
-        logging.debug(f"GIF duration per frame: {duration_per_frame_in_ms} ms")
-        logging.debug(f"GIF total duration: {len(frames) * duration_per_frame_in_ms} ms")
+        logging.debug(f"GIF total duration: {sum(durations)} ms")
 
-        return frames, duration_per_frame_in_ms
\ No newline at end of file
+        return frames, durations
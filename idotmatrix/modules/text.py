@@ -1,16 +1,40 @@
+import asyncio
 import logging
+import threading
 import zlib
 from enum import Enum
-from typing import Tuple, Optional
+from functools import lru_cache
+from os import PathLike
+from typing import Any, Awaitable, Callable, Tuple, Optional
 
 from PIL import Image, ImageDraw, ImageFont
 
 from . import IDotMatrixModule
+from ..connection_manager import ConnectionManager
+from ..screensize import ScreenSize
 from ..util import color_utils
+from ..util import packet_utils
+from ..util.glyph_atlas import GlyphAtlas, atlas_path, build_atlas, font_digest, load_atlas
 
 from pathlib import Path
 import os
 
+FONT_CACHE_SIZE = 8
+# Packed glyphs are only a few dozen bytes each
+GLYPH_CACHE_SIZE = 2048
+
+# FreeType faces are not thread-safe, and text is rendered in worker threads
+_render_lock = threading.Lock()
+
+# Text packets with more payload than this are sent in acknowledged 4K chunks, like GIFs
+TEXT_CHUNKED_THRESHOLD = packet_utils.CHUNK_SIZE_4096
+
+# Where glyph atlases are built on first use of a font, None builds them next to the font file
+_glyph_atlas_directory: Optional[str] = None
+
+# Characters checked to decide whether a font fits into a glyph cell, see _font_fits_cell
+GLYPH_FIT_SAMPLE_CHARACTERS = "".join(chr(c) for c in range(0x21, 0x7F))
+
 class TextMode(Enum):
     REPLACE = 0
     MARQUEE = 1
@@ -32,15 +56,46 @@ class TextColorMode(Enum):
     RAINBOW_4 = 5
 
 
+class GlyphSize(Enum):
+    """Enum for the glyph cell sizes supported by the device."""
+    SIZE_16x32 = (16, 32)
+    SIZE_8x16 = (8, 16)
+
+
+# Precedes the bitmap of every glyph, the first byte tells the device the glyph cell size
+GLYPH_SEPARATORS = {
+    GlyphSize.SIZE_16x32: b"\x05\xff\xff\xff",
+    GlyphSize.SIZE_8x16: b"\x02\xff\xff\xff",
+}
+
+
 class TextModule(IDotMatrixModule):
     """Manages text processing and packet creation for iDotMatrix devices. With help from https://github.com/8none1/idotmatrix/ :)"""
 
     logging = logging.getLogger(__name__)
-    # must be 16x32 or 8x16
-    image_width = 16
-    image_height = 32
-    # must be x05 for 16x32 or x02 for 8x16
-    separator = b"\x05\xff\xff\xff"
+
+    def __init__(
+        self,
+        connection_manager: ConnectionManager,
+        screen_size: Optional[ScreenSize] = None,
+    ) -> None:
+        super().__init__(connection_manager=connection_manager)
+        self.screen_size = screen_size
+
+    def choose_glyph_size(self, font_size: int, font_path: Optional[str] = None) -> GlyphSize:
+        """
+        Chooses the glyph cell size for the screen and font.
+        8x16 glyphs take a quarter of the bytes of 16x32 glyphs, and are used on panels up to 32x32 if the glyphs
+        of the font fit into them without being clipped. Larger panels and fonts use 16x32 glyphs.
+        """
+        glyph_width, glyph_height = GlyphSize.SIZE_8x16.value
+        if (
+            self.screen_size is not None
+            and self.screen_size.value[1] <= 32
+            and _font_fits_cell(str(_resolve_font_path(font_path)), font_size, glyph_width, glyph_height)
+        ):
+            return GlyphSize.SIZE_8x16
+        return GlyphSize.SIZE_16x32
 
     async def show_text(
         self,
@@ -52,6 +107,7 @@ class TextModule(IDotMatrixModule):
         text_color_mode: TextColorMode | int = TextColorMode.WHITE,
         text_color: Tuple[int, int, int] or int or str = None,
         text_bg_color: Optional[Tuple[int, int, int] or int or str] = None,
+        glyph_size: Optional[GlyphSize] = None,
     ):
         """
         Displays text on the iDotMatrix device with specified settings.
@@ -64,6 +120,8 @@ class TextModule(IDotMatrixModule):
             text_color_mode (TextColorMode | int): Color mode for the text. Defaults to TextColorMode.WHITE.
             text_color (Tuple[int, int, int]): RGB color for the text. Defaults to None, which uses white.
             text_bg_color (Optional[Tuple[int, int, int]]): RGB color for the background. Defaults to None, which uses black.
+            glyph_size (Optional[GlyphSize]): Size of the glyph cells. Defaults to None, which chooses it from the screen
+                and font size, see choose_glyph_size.
         Raises:
             ValueError: If text_color is None and text_color_mode is RGB.
         Raises:
@@ -71,6 +129,37 @@ class TextModule(IDotMatrixModule):
         Raises:
             ValueError: If text_color is None when text_color_mode is RGB.
         """
+        data = await self.build_text_packet(
+            text=text,
+            font_size=font_size,
+            font_path=font_path,
+            text_mode=text_mode,
+            speed=speed,
+            text_color_mode=text_color_mode,
+            text_color=text_color,
+            text_bg_color=text_bg_color,
+            glyph_size=glyph_size,
+        )
+        await self.send_text_packet(data)
+
+    async def build_text_packet(
+        self,
+        text: str,
+        font_size: int = 16,
+        font_path: Optional[str] = None,
+        text_mode: TextMode | int = TextMode.MARQUEE,
+        speed: int = 95,
+        text_color_mode: TextColorMode | int = TextColorMode.WHITE,
+        text_color: Tuple[int, int, int] or int or str = None,
+        text_bg_color: Optional[Tuple[int, int, int] or int or str] = None,
+        glyph_size: Optional[GlyphSize] = None,
+    ) -> bytearray:
+        """
+        Builds the packet that displays text on the device, see show_text for the arguments.
+
+        Returns:
+            bytearray: The packet to send with send_text_packet.
+        """
         if isinstance(text_mode, TextMode):
             text_mode = text_mode.value
 
@@ -90,20 +179,74 @@ class TextModule(IDotMatrixModule):
         else:
             text_bg_color = color_utils.parse_color_rgb(text_bg_color)
 
-        data = self._build_string_packet(
+        if glyph_size is None:
+            # measures the glyphs of the font, which loads it on first use
+            glyph_size = await asyncio.to_thread(self.choose_glyph_size, font_size, font_path)
+
+        # Rendering long text takes a while, run it in thread pool to avoid blocking the event loop
+        text_bitmaps = await asyncio.to_thread(
+            self._string_to_bitmaps,
+            text=text,
+            font_size=font_size,
+            font_path=font_path,
+            glyph_size=glyph_size,
+        )
+        return self._build_string_packet(
             text_mode=text_mode,
             speed=speed,
             text_color_mode=text_color_mode,
             text_color=text_color,
             text_bg_mode=text_bg_mode,
             text_bg_color=text_bg_color,
-            text_bitmaps=self._string_to_bitmaps(
-                text=text,
-                font_size=font_size,
-                font_path=font_path,
-            ),
+            text_bitmaps=text_bitmaps,
+            glyph_size=glyph_size,
+        )
+
+    async def send_text_packet(
+        self,
+        data: bytearray | bytes,
+        should_abort: Optional[Callable[[], bool]] = None,
+        between_chunks: Optional[Callable[[], Awaitable[Any]]] = None,
+    ):
+        """
+        Sends a packet built by build_text_packet to the device.
+        Packets with more than TEXT_CHUNKED_THRESHOLD bytes of payload are sent in acknowledged chunks,
+        see create_text_chunk_packets.
+
+        Args:
+            data (bytearray | bytes): The packet to send.
+            should_abort (Optional[Callable[[], bool]]): Checked between chunks of a chunked transfer, which is
+                aborted with TransferAborted if it returns True. Single packets are always sent completely.
+            between_chunks (Optional[Callable[[], Awaitable[Any]]]): Awaited between chunks of a chunked transfer.
+        """
+        if len(data) - packet_utils.HEADER_SIZE > TEXT_CHUNKED_THRESHOLD:
+            await self._send_packets(
+                packets=self.create_text_chunk_packets(data),
+                response=True,
+                should_abort=should_abort,
+                between_packets=between_chunks,
+            )
+        else:
+            await self._send_bytes(data=data)
+
+    def create_text_chunk_packets(self, data: bytearray | bytes) -> list[list[memoryview]]:
+        """
+        Splits a packet built by build_text_packet into 4K chunks, using the same framing as GIF uploads:
+        every chunk repeats the header with its own length and a first/continuation flag, while the total
+        length and CRC32 still describe the whole payload.
+
+        Args:
+            data (bytearray | bytes): The packet to split.
+        Returns:
+            list[list[memoryview]]: The chunks with headers, each split into BLE packets.
+        """
+        view = memoryview(data)
+        return packet_utils.create_chunked_packets(
+            payload=view[packet_utils.HEADER_SIZE:],
+            header=view[:packet_utils.HEADER_SIZE],
+            # the last packet of every chunk is written with response
+            ble_packet_size=self._connection_manager.get_ble_packet_size(response=True),
         )
-        await self._send_bytes(data=data)
 
     def _build_string_packet(
         self,
@@ -114,6 +257,7 @@ class TextModule(IDotMatrixModule):
         text_color: Tuple[int, int, int] = (255, 255, 255),
         text_bg_mode: int = 0,
         text_bg_color: Tuple[int, int, int] = (0, 255, 0),
+        glyph_size: GlyphSize = GlyphSize.SIZE_16x32,
     ) -> bytearray:
         """Constructs a packet with the settings and bitmaps for iDotMatrix devices.
 
@@ -125,11 +269,12 @@ class TextModule(IDotMatrixModule):
             text_color (Tuple[int, int, int], optional): Text RGB Color. Defaults to (255, 0, 0).
             text_bg_mode (int, optional): Text Background Mode. Defaults to 0. 0 = black, 1 = use given RGB color
             text_bg_color (Tuple[int, int, int], optional): Background RGB Color. Defaults to (0, 0, 0).
+            glyph_size (GlyphSize, optional): Size of the glyph cells in text_bitmaps. Defaults to 16x32.
 
         Returns:
             bytearray: A bytearray containing the complete packet to be sent to the iDotMatrix device.
         """
-        num_chars = text_bitmaps.count(self.separator)
+        num_chars = text_bitmaps.count(GLYPH_SEPARATORS[glyph_size])
 
         text_metadata = bytearray(
             [
@@ -177,35 +322,115 @@ class TextModule(IDotMatrixModule):
         return header + packet
 
     def _string_to_bitmaps(
-        self, text: str, font_path: Optional[str] = None, font_size: Optional[int] = 20
+        self,
+        text: str,
+        font_path: Optional[str] = None,
+        font_size: Optional[int] = 20,
+        glyph_size: GlyphSize = GlyphSize.SIZE_16x32,
     ) -> bytearray:
         """Converts text to bitmap images suitable for iDotMatrix devices."""
-        if not font_path:
-            # using open source font from https://www.fontspace.com/rain-font-f22577
-            font_path = Path(__file__).resolve().parent.parent / "fonts" / "Rain-DRM3.otf"
-        else:
-            font_path = Path(font_path)
-        
-        self.logging.error("FONT PATH=%s exists=%s cwd=%s", font_path, font_path.exists(), os.getcwd())
-
-        font = ImageFont.truetype(str(font_path), font_size)
+        font_path = _resolve_font_path(font_path)
+        width, height = glyph_size.value
+        separator = GLYPH_SEPARATORS[glyph_size]
         byte_stream = bytearray()
         for char in text:
-            # todo make image the correct size for 16x16, 32x32 and 64x64
-            image = Image.new("1", (self.image_width, self.image_height), 0)
-            draw = ImageDraw.Draw(image)
+            bitmap = _render_glyph(str(font_path), font_size, width, height, char)
+            byte_stream.extend(separator + bitmap)
+        return byte_stream
+
+
+def _resolve_font_path(font_path: Optional[str]) -> Path:
+    """Returns the path of the given font, or of the default font if none is given."""
+    if not font_path:
+        # using open source font from https://www.fontspace.com/rain-font-f22577
+        return Path(__file__).resolve().parent.parent / "fonts" / "Rain-DRM3.otf"
+    return Path(font_path)
+
+
+@lru_cache(maxsize=FONT_CACHE_SIZE)
+def _load_font(font_path: str, font_size: int) -> ImageFont.FreeTypeFont:
+    """Loads a font, shared by all glyphs rendered with it."""
+    TextModule.logging.debug("Loading font %s (size %s), exists=%s cwd=%s", font_path, font_size, os.path.exists(font_path), os.getcwd())
+    return ImageFont.truetype(font_path, font_size)
+
+
+def set_glyph_atlas_directory(directory: Optional[PathLike | str]) -> None:
+    """
+    Sets where glyph atlases are built and cached on first use of a font, f.e. a writable data directory.
+    Atlases shipped next to a font file are used in any case. Defaults to None, which builds them next to the font.
+    """
+    global _glyph_atlas_directory
+    _glyph_atlas_directory = None if directory is None else str(directory)
+    _load_glyph_atlas.cache_clear()
+    _render_glyph.cache_clear()
+
+
+@lru_cache(maxsize=FONT_CACHE_SIZE)
+def _load_glyph_atlas(font_path: str, font_size: int, width: int, height: int) -> Optional[GlyphAtlas]:
+    """
+    Loads the glyph atlas of a font, see glyph_atlas. If there is none yet, or only a stale one, it is built with the
+    printable ASCII and Latin-1 characters, so later renders of these don't need FreeType. Returns None if it can't
+    be built.
+    """
+    try:
+        digest = font_digest(font_path)
+    except OSError as e:
+        TextModule.logging.warning(f"Could not read font {font_path}, rendering glyphs on demand: {e}")
+        return None
+    atlas = load_atlas(atlas_path(font_path, font_size, width, height), digest)
+    if atlas is not None:
+        return atlas
+    path = atlas_path(font_path, font_size, width, height, directory=_glyph_atlas_directory)
+    atlas = load_atlas(path, digest)
+    if atlas is not None:
+        return atlas
+
+    TextModule.logging.debug(f"Building glyph atlas {path}")
+    try:
+        build_atlas(font_path, font_size, width, height, path=path)
+    except (OSError, ValueError) as e:
+        TextModule.logging.warning(f"Could not build glyph atlas {path}, rendering glyphs on demand: {e}")
+        return None
+    return load_atlas(path, digest)
+
+
+@lru_cache(maxsize=GLYPH_CACHE_SIZE)
+def _render_glyph(font_path: str, font_size: int, width: int, height: int, char: str) -> bytes:
+    """Returns the packed bitmap of a character, from the glyph atlas of the font if it has the character."""
+    atlas = _load_glyph_atlas(font_path, font_size, width, height)
+    if atlas is not None:
+        bitmap = atlas.get(char)
+        if bitmap is not None:
+            return bitmap
+    return _rasterize_glyph(font_path, font_size, width, height, char)
+
+
+def _rasterize_glyph(font_path: str, font_size: int, width: int, height: int, char: str) -> bytes:
+    """
+    Renders a character centered in a width x height cell and packs it into the device bitmap format.
+    Bump glyph_atlas.RENDERER_VERSION when changing the output, so atlases built before are rebuilt.
+    """
+    image = Image.new("1", (width, height), 0)
+    draw = ImageDraw.Draw(image)
+    with _render_lock:
+        font = _load_font(font_path, font_size)
+        _, _, text_width, text_height = draw.textbbox((0, 0), text=char, font=font)
+        text_x = (width - text_width) // 2
+        text_y = (height - text_height) // 2
+        draw.text((text_x, text_y), char, fill=1, font=font)
+    # "1;R" packs each row LSB first, padded to full bytes, which is the bit order of the device
+    return image.tobytes("raw", "1;R")
+
+
+@lru_cache(maxsize=FONT_CACHE_SIZE)
+def _font_fits_cell(font_path: str, font_size: int, width: int, height: int) -> bool:
+    """Returns whether the printable ASCII glyphs of a font fit into a width x height cell without being clipped."""
+    draw = ImageDraw.Draw(Image.new("1", (width, height), 0))
+    with _render_lock:
+        font = _load_font(font_path, font_size)
+        for char in GLYPH_FIT_SAMPLE_CHARACTERS:
+            # _rasterize_glyph centers the glyph by its right and bottom edge, so these have to fit
             _, _, text_width, text_height = draw.textbbox((0, 0), text=char, font=font)
-            text_x = (self.image_width - text_width) // 2
-            text_y = (self.image_height - text_height) // 2
-            draw.text((text_x, text_y), char, fill=1, font=font)
-            bitmap = bytearray()
-            for y in range(self.image_height):
-                for x in range(self.image_width):
-                    if x % 8 == 0:
-                        byte = 0
-                    pixel = image.getpixel((x, y))
-                    byte |= (pixel & 1) << (x % 8)
-                    if x % 8 == 7 or x == self.image_width - 1:
-                        bitmap.append(byte)
-            byte_stream.extend(self.separator + bitmap)
-        return byte_stream
\ No newline at end of file
+            if text_width > width or text_height > height:
+                return False
+    return True
@@ -0,0 +1,176 @@
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from os import PathLike
+from typing import Any, Dict, Optional
+
+DEFAULT_MEMORY_LIMIT_BYTES = 8 * 1024 * 1024
+DEFAULT_DISK_LIMIT_BYTES = 64 * 1024 * 1024
+
+CACHE_FILE_SUFFIX = ".gifcache"
+CRC32_SIZE = 4
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class EncodedGif:
+    """
+    A GIF encoded for the device, together with the CRC32 sent in the upload headers.
+    """
+    data: bytes
+    crc32: int
+    # Encoder options that were reduced to fit a payload budget, not cached, see GifModule.encode_gif_file
+    settings: Optional[Dict[str, Any]] = field(default=None, compare=False)
+
+
+def file_digest(file_path: PathLike | str) -> str:
+    """
+    Returns the SHA-256 hex digest of the content of a file.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def make_key(content_digest: str, *options) -> str:
+    """
+    Returns the cache key for a file content digest and the options it is encoded with.
+    """
+    return hashlib.sha256(repr((content_digest,) + options).encode()).hexdigest()
+
+
+class GifCache:
+    """
+    Content-addressed LRU cache of encoded GIFs, with an in-memory tier and an optional on-disk tier.
+
+    Both tiers are bounded by the total size of the cached GIFs and evict the least recently used entries
+    first. The cache does blocking file I/O and is meant to be used from a worker thread, it is thread-safe.
+    """
+
+    def __init__(
+        self,
+        directory: Optional[PathLike | str] = None,
+        memory_limit_bytes: int = DEFAULT_MEMORY_LIMIT_BYTES,
+        disk_limit_bytes: int = DEFAULT_DISK_LIMIT_BYTES,
+    ):
+        """
+        Args:
+            directory (Optional[PathLike | str]): Directory of the on-disk tier, which is disabled if not set.
+            memory_limit_bytes (int): Maximum total size of the GIFs kept in memory.
+            disk_limit_bytes (int): Maximum total size of the GIFs kept on disk.
+        """
+        self._directory = directory
+        self._memory_limit_bytes = memory_limit_bytes
+        self._disk_limit_bytes = disk_limit_bytes
+        self._memory: OrderedDict[str, EncodedGif] = OrderedDict()
+        self._memory_size = 0
+        # key -> file size, in least recently used order, loaded from the directory on first use
+        self._disk: Optional[OrderedDict[str, int]] = None
+        self._disk_size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[EncodedGif]:
+        """
+        Returns the cached GIF for the key, or None if it is not cached.
+        """
+        with self._lock:
+            encoded = self._memory.get(key)
+            if encoded is not None:
+                self._memory.move_to_end(key)
+                return encoded
+            encoded = self._read_from_disk(key)
+            if encoded is not None:
+                self._put_in_memory(key, encoded)
+            return encoded
+
+    def put(self, key: str, encoded: EncodedGif) -> None:
+        """
+        Caches the GIF for the key, evicting the least recently used entries if a tier gets too big.
+        """
+        with self._lock:
+            self._put_in_memory(key, encoded)
+            self._write_to_disk(key, encoded)
+
+    def _put_in_memory(self, key: str, encoded: EncodedGif) -> None:
+        if len(encoded.data) > self._memory_limit_bytes:
+            return
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_size -= len(previous.data)
+        self._memory[key] = encoded
+        self._memory_size += len(encoded.data)
+        while self._memory_size > self._memory_limit_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_size -= len(evicted.data)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self._directory, key + CACHE_FILE_SUFFIX)
+
+    def _load_disk_index(self) -> OrderedDict[str, int]:
+        if self._disk is None:
+            entries = []
+            os.makedirs(self._directory, exist_ok=True)
+            with os.scandir(self._directory) as it:
+                for entry in it:
+                    if entry.is_file() and entry.name.endswith(CACHE_FILE_SUFFIX):
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime, entry.name[:-len(CACHE_FILE_SUFFIX)], stat.st_size))
+            self._disk = OrderedDict((key, size) for _, key, size in sorted(entries))
+            self._disk_size = sum(self._disk.values())
+        return self._disk
+
+    def _read_from_disk(self, key: str) -> Optional[EncodedGif]:
+        if self._directory is None:
+            return None
+        try:
+            disk = self._load_disk_index()
+            if key not in disk:
+                return None
+            path = self._path(key)
+            with open(path, "rb") as f:
+                content = f.read()
+            # touch the file, so the recency survives restarts
+            os.utime(path)
+        except OSError as e:
+            logger.warning(f"Failed to read cached GIF {key}: {e}")
+            return None
+        disk.move_to_end(key)
+        return EncodedGif(
+            data=content[CRC32_SIZE:],
+            crc32=int.from_bytes(content[:CRC32_SIZE], byteorder="little"),
+        )
+
+    def _write_to_disk(self, key: str, encoded: EncodedGif) -> None:
+        if self._directory is None:
+            return
+        size = CRC32_SIZE + len(encoded.data)
+        if size > self._disk_limit_bytes:
+            return
+        try:
+            disk = self._load_disk_index()
+            path = self._path(key)
+            # write to a temporary file first, so a crash never leaves a truncated entry behind
+            temp_path = path + ".tmp"
+            with open(temp_path, "wb") as f:
+                f.write(encoded.crc32.to_bytes(CRC32_SIZE, byteorder="little"))
+                f.write(encoded.data)
+            os.replace(temp_path, path)
+        except OSError as e:
+            logger.warning(f"Failed to cache GIF {key}: {e}")
+            return
+        self._disk_size -= disk.pop(key, 0)
+        disk[key] = size
+        self._disk_size += size
+        while self._disk_size > self._disk_limit_bytes:
+            evicted_key, evicted_size = disk.popitem(last=False)
+            self._disk_size -= evicted_size
+            try:
+                os.remove(self._path(evicted_key))
+            except OSError as e:
+                logger.warning(f"Failed to evict cached GIF {evicted_key}: {e}")
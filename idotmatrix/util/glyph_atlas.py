@@ -0,0 +1,212 @@
+"""
+Precompiled glyph atlases: glyphs of a font already rendered and packed into the device bitmap format.
+
+An atlas file holds one font at one size for one glyph cell. Layout, all integers little-endian:
+    - header: magic b"IDMA", version (u16), renderer version (u16), cell width (u16), cell height (u16),
+      glyph count (u32), font digest (16 bytes)
+    - code points of the glyphs (u32 each), sorted ascending
+    - packed bitmaps of the glyphs, in the same order, each ceil(width / 8) * height bytes
+
+The renderer version and font digest tell which rendering and which font file an atlas was built with, an atlas
+that doesn't match either is stale and rebuilt.
+
+Atlases are built on first use of a font, see text._load_glyph_atlas, or generated ahead of time with:
+    python -m idotmatrix.util.glyph_atlas FONT_PATH --size 16 --cell 16x32
+"""
+import argparse
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import sys
+import threading
+from bisect import bisect_left
+from os import PathLike
+from typing import Dict, Iterable, Optional
+
+MAGIC = b"IDMA"
+VERSION = 2
+# Version of the glyph rendering, see text._rasterize_glyph. Bump it whenever rendered glyphs change
+RENDERER_VERSION = 1
+HEADER = struct.Struct("<4sHHHHI16s")
+FONT_DIGEST_SIZE = 16
+ATLAS_FILE_SUFFIX = ".atlas"
+
+# Printable ASCII and Latin-1
+DEFAULT_CHARACTERS = "".join(chr(c) for c in range(0x20, 0x7F)) + "".join(chr(c) for c in range(0xA0, 0x100))
+
+logger = logging.getLogger(__name__)
+
+
+def glyph_size(width: int, height: int) -> int:
+    """Returns the size of a packed glyph bitmap, rows are padded to full bytes."""
+    return (width + 7) // 8 * height
+
+
+def font_digest(font_path: PathLike | str) -> bytes:
+    """Returns the digest of a font file stored in its atlases, a truncated SHA-256 of its content."""
+    with open(font_path, "rb") as f:
+        return hashlib.sha256(f.read()).digest()[:FONT_DIGEST_SIZE]
+
+
+def atlas_path(
+    font_path: PathLike | str,
+    font_size: int,
+    width: int,
+    height: int,
+    directory: Optional[PathLike | str] = None,
+) -> str:
+    """
+    Returns where the atlas of a font is expected: next to the font file, or in directory if given,
+    named after the font, its size and cell.
+    """
+    base, _ = os.path.splitext(font_path)
+    if directory is not None:
+        # fonts in different directories may share a name
+        path_digest = hashlib.sha256(os.path.abspath(font_path).encode()).hexdigest()[:8]
+        base = os.path.join(directory, f"{os.path.basename(base)}-{path_digest}")
+    return f"{base}-{font_size}-{width}x{height}{ATLAS_FILE_SUFFIX}"
+
+
+class GlyphAtlas:
+    """
+    A memory-mapped glyph atlas file, see the module docstring for the format.
+    """
+
+    def __init__(self, path: PathLike | str):
+        """
+        Args:
+            path (PathLike | str): Path to the atlas file.
+        Raises:
+            ValueError: If the file is not a valid atlas.
+        """
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mmap) < HEADER.size:
+            raise ValueError(f"{path} is not a glyph atlas")
+        magic, version, self.renderer_version, self.width, self.height, count, self.font_digest = HEADER.unpack_from(
+            self._mmap
+        )
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a glyph atlas of version {VERSION}")
+        self._glyph_size = glyph_size(self.width, self.height)
+        bitmaps_offset = HEADER.size + 4 * count
+        if len(self._mmap) != bitmaps_offset + count * self._glyph_size:
+            raise ValueError(f"{path} is truncated")
+        self._code_points = memoryview(self._mmap)[HEADER.size:bitmaps_offset].cast("I")
+        if sys.byteorder != "little":
+            self._code_points = struct.unpack(f"<{count}I", self._code_points.tobytes())
+        self._bitmaps = memoryview(self._mmap)[bitmaps_offset:]
+
+    def get(self, char: str) -> Optional[bytes]:
+        """Returns the packed bitmap of a character, or None if it is not in the atlas."""
+        code_point = ord(char)
+        index = bisect_left(self._code_points, code_point)
+        if index == len(self._code_points) or self._code_points[index] != code_point:
+            return None
+        start = index * self._glyph_size
+        return bytes(self._bitmaps[start:start + self._glyph_size])
+
+    def __len__(self) -> int:
+        return len(self._code_points)
+
+
+def load_atlas(path: PathLike | str, digest: Optional[bytes] = None) -> Optional[GlyphAtlas]:
+    """
+    Loads an atlas file, or returns None if it doesn't exist, is invalid or stale: built with another renderer
+    version, or with another font file than the one of the given font digest.
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        atlas = GlyphAtlas(path)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring glyph atlas {path}: {e}")
+        return None
+    if atlas.renderer_version != RENDERER_VERSION or (digest is not None and atlas.font_digest != digest):
+        logger.debug(f"Ignoring stale glyph atlas {path}")
+        return None
+    return atlas
+
+
+def write_atlas(path: PathLike | str, width: int, height: int, glyphs: Dict[str, bytes], digest: bytes) -> None:
+    """
+    Writes an atlas file.
+
+    Args:
+        path (PathLike | str): Path of the atlas file.
+        width (int): Width of the glyph cell in pixels.
+        height (int): Height of the glyph cell in pixels.
+        glyphs (Dict[str, bytes]): Packed bitmap of each character.
+        digest (bytes): Digest of the font file the glyphs were rendered from, see font_digest.
+    """
+    size = glyph_size(width, height)
+    code_points = sorted(ord(char) for char in glyphs)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    # written under a temporary name first, so readers never see a partial atlas
+    temporary_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(temporary_path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, RENDERER_VERSION, width, height, len(code_points), digest))
+            f.write(struct.pack(f"<{len(code_points)}I", *code_points))
+            for code_point in code_points:
+                bitmap = glyphs[chr(code_point)]
+                if len(bitmap) != size:
+                    raise ValueError(f"Glyph {chr(code_point)!r} has {len(bitmap)} bytes instead of {size}")
+                f.write(bitmap)
+        os.replace(temporary_path, path)
+    finally:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+
+
+def build_atlas(
+    font_path: PathLike | str,
+    font_size: int,
+    width: int,
+    height: int,
+    characters: Iterable[str] = DEFAULT_CHARACTERS,
+    path: Optional[PathLike | str] = None,
+) -> str:
+    """
+    Renders the characters of a font and writes them into an atlas file.
+
+    Args:
+        font_path (PathLike | str): Path to the font file.
+        font_size (int): Size of the font.
+        width (int): Width of the glyph cell in pixels.
+        height (int): Height of the glyph cell in pixels.
+        characters (Iterable[str]): Characters to include. Defaults to printable ASCII and Latin-1.
+        path (Optional[PathLike | str]): Path of the atlas file. Defaults to atlas_path.
+    Returns:
+        str: Path of the written atlas file.
+    """
+    from ..modules.text import _rasterize_glyph
+
+    if path is None:
+        path = atlas_path(font_path, font_size, width, height)
+    digest = font_digest(font_path)
+    glyphs = {char: _rasterize_glyph(str(font_path), font_size, width, height, char) for char in set(characters)}
+    write_atlas(path, width, height, glyphs, digest)
+    return str(path)
+
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(description="Builds a precompiled glyph atlas for a font.")
+    parser.add_argument("font_path", help="path to the font file")
+    parser.add_argument("--size", type=int, required=True, help="font size")
+    parser.add_argument("--cell", default="16x32", choices=["16x32", "8x16"], help="glyph cell size")
+    parser.add_argument("--characters", default=DEFAULT_CHARACTERS, help="characters to include")
+    parser.add_argument("--output", help="path of the atlas file, defaults to next to the font")
+    args = parser.parse_args(argv)
+
+    width, height = (int(v) for v in args.cell.split("x"))
+    path = build_atlas(args.font_path, args.size, width, height, args.characters, args.output)
+    print(f"Wrote {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 from enum import Enum
 
 from PIL import Image as PILImage
+from PIL import ImageChops
 
 
 def palettize(
@@ -28,6 +29,88 @@ def palettize(
     )
 
 
+def build_global_palette(
+    images: list[PILImage.Image],
+    colors: int = 256,
+    max_sample_images: int = 16,
+) -> PILImage.Image:
+    """
+    Build one adaptive palette for a sequence of images, f.e. all frames of an animation.
+
+    :param images: The images the palette is built for.
+    :param colors: The number of colors in the palette (default is 256).
+    :param max_sample_images: The maximum number of images, evenly picked from the sequence, the palette is built from.
+    :return: An image in mode "P" that carries the palette, to be used with palettize_with.
+    """
+    if not images:
+        raise ValueError("At least one image is required to build a palette.")
+
+    step = max(1, -(-len(images) // max_sample_images))  # Ceiling division
+    sample = images[::step]
+    width = max(image.width for image in sample)
+    height = max(image.height for image in sample)
+    # stack the sampled images, so the palette is quantized from the colors of all of them at once
+    montage = PILImage.new("RGB", (width, height * len(sample)))
+    for i, image in enumerate(sample):
+        montage.paste(image.convert("RGB"), (0, i * height))
+    return montage.quantize(colors=colors, dither=PILImage.Dither.NONE)
+
+
+def palettize_with(
+    image: PILImage.Image,
+    palette: PILImage.Image,
+    dither: PILImage.Dither = PILImage.Dither.NONE,
+) -> PILImage.Image:
+    """
+    Map an image onto a given palette.
+
+    :param image: The input image to be palettized.
+    :param palette: An image in mode "P" that carries the palette, f.e. from build_global_palette.
+    :param dither: The dithering method to use (default is PILImage.Dither.NONE).
+    :return: The palettized image.
+    """
+    return image.convert("RGB").quantize(palette=palette, dither=dither)
+
+
+def make_unchanged_pixels_transparent(
+    frames: list[PILImage.Image],
+    transparent_index: int,
+) -> list[PILImage.Image]:
+    """
+    Replace the pixels of each frame that didn't change since the previous frame with a transparent palette index.
+    Meant for animations where every frame is drawn on top of the previous one (GIF disposal 1), where transparent
+    pixels keep what the previous frame showed. Runs of a single index compress much better than the original colors.
+
+    :param frames: Frames in mode "P" that share the same palette, see build_global_palette. The transparent index
+                   must not be used by any of them.
+    :param transparent_index: The palette index to use for unchanged pixels.
+    :return: The frames, the first one unchanged.
+    """
+    result = frames[:1]
+    for previous, frame in zip(frames, frames[1:]):
+        # compare palette indices, not colors, the frames share the same palette
+        previous_indices = PILImage.frombytes("L", previous.size, previous.tobytes())
+        indices = PILImage.frombytes("L", frame.size, frame.tobytes())
+        unchanged = ImageChops.difference(previous_indices, indices).point(lambda value: 255 if value == 0 else 0)
+        frame = frame.copy()
+        frame.paste(transparent_index, box=(0, 0, frame.width, frame.height), mask=unchanged)
+        frame.info["transparency"] = transparent_index
+        result.append(frame)
+    return result
+
+
+def max_pixel_difference(image1: PILImage.Image, image2: PILImage.Image) -> int:
+    """
+    Return the largest difference between two images of the same size, over all pixels and color channels.
+
+    :param image1: The first image.
+    :param image2: The second image.
+    :return: 0 if the images show the same colors, up to 255 otherwise.
+    """
+    difference = ImageChops.difference(image1.convert("RGB"), image2.convert("RGB"))
+    return max(high for _, high in difference.getextrema())
+
+
 class ResizeMode(Enum):
     """
     Enum for resize modes.
@@ -0,0 +1,67 @@
+CHUNK_SIZE_4096 = 4096
+HEADER_SIZE = 16  # As per sendImageData logic in GifAgreement.java
+
+CHUNK_FLAG_FIRST = 0
+CHUNK_FLAG_CONTINUATION = 2
+
+
+def chunk_data_by_size(data: bytes | memoryview, chunk_size: int) -> list[memoryview]:
+    """
+    Chunks data into smaller pieces of a specified size, as views into data without copying it.
+    Corresponds to getSendData4096.
+    """
+    view = memoryview(data)
+    return [view[start:start + chunk_size] for start in range(0, len(view), chunk_size)]
+
+
+def create_ble_packets(data_packet: bytes | memoryview, mtu_packet_size: int) -> list[memoryview]:
+    """
+    Splits a single data packet into smaller packets suitable for BLE transmission, as views into data_packet.
+    Corresponds to getSendData, which uses fixed sizes of 509 (MTU enabled) or 18 bytes.
+    """
+    return chunk_data_by_size(data_packet, mtu_packet_size)
+
+
+def create_chunked_packets(
+    payload: bytes | memoryview,
+    header: bytes | memoryview,
+    ble_packet_size: int,
+    chunk_size: int = CHUNK_SIZE_4096,
+) -> list[list[memoryview]]:
+    """
+    Creates the packets of a chunked transfer, as used for GIF uploads.
+    The payload is split into chunks, each sent with a copy of the 16 byte header, in which the chunk length
+    (bytes 0-1) and the first/continuation flag (byte 4) are filled in. The rest of the header, like the command,
+    total payload length and CRC32, is set by the caller.
+
+    The framed stream is written once into a single buffer, the returned packets are read-only views into it.
+
+    Args:
+        payload (bytes | memoryview): The data to transfer.
+        header (bytes | memoryview): The header template.
+        ble_packet_size (int): Size of the BLE packets each chunk is split into.
+        chunk_size (int): Maximum number of payload bytes per chunk. Defaults to 4096.
+    Returns:
+        list[list[memoryview]]: The chunks with headers, each split into BLE packets.
+    """
+    if len(header) != HEADER_SIZE:
+        raise ValueError(f"header must be {HEADER_SIZE} bytes, got {len(header)}")
+
+    chunks = chunk_data_by_size(payload, chunk_size)
+    buffer = bytearray(len(payload) + HEADER_SIZE * len(chunks))
+    offset = 0
+    for i, chunk in enumerate(chunks):
+        buffer[offset:offset + HEADER_SIZE] = header
+        buffer[offset:offset + 2] = (len(chunk) + HEADER_SIZE).to_bytes(2, byteorder="little")
+        buffer[offset + 4] = CHUNK_FLAG_CONTINUATION if i > 0 else CHUNK_FLAG_FIRST
+        buffer[offset + HEADER_SIZE:offset + HEADER_SIZE + len(chunk)] = chunk
+        offset += HEADER_SIZE + len(chunk)
+
+    stream = memoryview(buffer).toreadonly()
+    packets = []
+    offset = 0
+    for chunk in chunks:
+        framed_size = HEADER_SIZE + len(chunk)
+        packets.append(create_ble_packets(stream[offset:offset + framed_size], ble_packet_size))
+        offset += framed_size
+    return packets
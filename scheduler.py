@@ -0,0 +1,108 @@
+"""Priority scheduling of the commands sent to a device."""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from enum import IntEnum
+
+
+class Priority(IntEnum):
+    """Priority of a command, lower values run first."""
+
+    # Power, reset, brightness and other short commands
+    CONTROL = 0
+    TEXT = 1
+    # GIF uploads and other transfers that take seconds
+    MEDIA = 2
+
+
+class CommandScheduler:
+    """Grants exclusive access to a device, to waiting commands in priority order.
+
+    Commands of the same priority run in the order they asked for access. A
+    long running command can let waiting commands of a higher priority run in
+    between, see ``async_yield``.
+    """
+
+    def __init__(self) -> None:
+        self._held = False
+        self._waiters: list[tuple[int, int, asyncio.Future[None]]] = []
+        self._order = itertools.count()
+
+    def has_waiters_above(self, priority: Priority) -> bool:
+        """Return whether a command with a higher priority is waiting."""
+        return any(
+            waiter_priority < priority and not future.done()
+            for waiter_priority, _, future in self._waiters
+        )
+
+    async def async_acquire(self, priority: Priority, order: int | None = None) -> int:
+        """Wait until the command may access the device.
+
+        Returns the position of the command among those of the same priority.
+        A command that gives access up in between passes it again, so it
+        continues before commands that asked for access after it.
+        """
+        if order is None:
+            order = next(self._order)
+        if not self._held and not self._waiters:
+            self._held = True
+            return order
+        future: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, order, future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Access was handed over right before the cancellation, pass it on
+                self.release()
+            raise
+        return order
+
+    def release(self) -> None:
+        """Hand access over to the next waiting command, if any."""
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self._held = False
+
+    @asynccontextmanager
+    async def hold(self, priority: Priority) -> AsyncIterator[Grant]:
+        """Hold access to the device while running a command."""
+        order = await self.async_acquire(priority)
+        grant = Grant(self, priority, order)
+        try:
+            yield grant
+        finally:
+            if grant.held:
+                self.release()
+
+
+class Grant:
+    """Access to the device held by a running command, see ``CommandScheduler.hold``."""
+
+    def __init__(self, scheduler: CommandScheduler, priority: Priority, order: int) -> None:
+        self._scheduler = scheduler
+        self.priority = priority
+        self._order = order
+        self.held = True
+
+    async def async_yield(self) -> None:
+        """Let waiting commands with a higher priority run, then continue.
+
+        Meant to be called at points where the command can be interrupted,
+        like between the chunks of a transfer.
+        """
+        if not self._scheduler.has_waiters_above(self.priority):
+            return
+        self._scheduler.release()
+        self.held = False
+        # resume before commands of the same priority that are waiting, they asked for access later
+        await self._scheduler.async_acquire(self.priority, self._order)
+        self.held = True
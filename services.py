@@ -2,7 +2,10 @@
 
 from __future__ import annotations
 
+import asyncio
 import logging
+import time
+from collections.abc import Awaitable, Callable
 
 import voluptuous as vol
 
@@ -10,9 +13,9 @@ from homeassistant.core import HomeAssistant, ServiceCall
 from homeassistant.helpers import config_validation as cv
 from homeassistant.helpers import entity_registry as er
 
-from .hub import IDotMatrixHub
+from .hub import IDotMatrixHub, SharedGifUpload
 
-from .const import DOMAIN
+from .const import DOMAIN, DEFAULT_SERVICE_CONCURRENCY
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -20,18 +23,39 @@ SERVICE_UPLOAD_GIF = "upload_gif"
 SERVICE_SCREEN_ON = "screen_on"
 SERVICE_SCREEN_OFF = "screen_off"
 
+ATTR_CONCURRENCY = "concurrency"
+ATTR_FORCE = "force"
+ATTR_GLOBAL_PALETTE = "global_palette"
+ATTR_PALETTE_COLORS = "palette_colors"
+ATTR_DELTA_FRAMES = "delta_frames"
+ATTR_DUPLICATE_FRAME_THRESHOLD = "duplicate_frame_threshold"
+ATTR_MAX_PAYLOAD_BYTES = "max_payload_bytes"
+ATTR_MAX_UPLOAD_SECONDS = "max_upload_seconds"
+
 MEDIA_SOURCE_PREFIX = "media-source://media_source/local/"
 
+CONCURRENCY_SCHEMA = vol.All(vol.Coerce(int), vol.Range(min=1, max=32))
+
 UPLOAD_GIF_SCHEMA = vol.Schema(
     {
         vol.Required("entity_id"): cv.entity_ids,
         vol.Required("media_file"): cv.string,
+        vol.Optional(ATTR_GLOBAL_PALETTE, default=False): cv.boolean,
+        vol.Optional(ATTR_PALETTE_COLORS, default=256): vol.All(vol.Coerce(int), vol.Range(min=2, max=256)),
+        vol.Optional(ATTR_DELTA_FRAMES, default=False): cv.boolean,
+        vol.Optional(ATTR_DUPLICATE_FRAME_THRESHOLD, default=0): vol.All(vol.Coerce(int), vol.Range(min=0, max=255)),
+        vol.Optional(ATTR_MAX_PAYLOAD_BYTES): vol.All(vol.Coerce(int), vol.Range(min=1024)),
+        vol.Optional(ATTR_MAX_UPLOAD_SECONDS): vol.All(vol.Coerce(float), vol.Range(min=1)),
+        vol.Optional(ATTR_CONCURRENCY, default=DEFAULT_SERVICE_CONCURRENCY): CONCURRENCY_SCHEMA,
+        vol.Optional(ATTR_FORCE, default=False): cv.boolean,
     }
 )
 
 SCREEN_SCHEMA = vol.Schema(
     {
         vol.Required("entity_id"): cv.entity_ids,
+        vol.Optional(ATTR_CONCURRENCY, default=DEFAULT_SERVICE_CONCURRENCY): CONCURRENCY_SCHEMA,
+        vol.Optional(ATTR_FORCE, default=False): cv.boolean,
     }
 )
 
@@ -44,6 +68,47 @@ def _get_hub_for_entity(hass: HomeAssistant, entity_id: str) -> IDotMatrixHub |
     return hass.data.get(DOMAIN, {}).get(entity_entry.config_entry_id)
 
 
+async def _async_run_for_entities(
+    hass: HomeAssistant,
+    call: ServiceCall,
+    action: Callable[[IDotMatrixHub], Awaitable[None]],
+) -> None:
+    """Run the action on the devices of all targeted entities concurrently.
+
+    At most ``concurrency`` devices are handled at the same time. A failure on
+    one device is logged and doesn't affect the others.
+    """
+    entity_ids: list[str] = call.data["entity_id"]
+    semaphore = asyncio.Semaphore(call.data[ATTR_CONCURRENCY])
+    started = time.monotonic()
+
+    async def _async_run(entity_id: str) -> bool:
+        hub = _get_hub_for_entity(hass, entity_id)
+        if hub is None:
+            _LOGGER.warning("Could not find iDotMatrix device for entity %s", entity_id)
+            return False
+        async with semaphore:
+            try:
+                await action(hub)
+            except TimeoutError:
+                _LOGGER.error("Timeout running %s for %s", call.service, entity_id)
+                return False
+            except Exception:
+                _LOGGER.exception("Failed to run %s for %s", call.service, entity_id)
+                return False
+        _LOGGER.info("Finished %s for %s", call.service, entity_id)
+        return True
+
+    results = await asyncio.gather(*(_async_run(entity_id) for entity_id in entity_ids))
+    _LOGGER.info(
+        "Finished %s for %d of %d entities in %.2fs",
+        call.service,
+        sum(results),
+        len(entity_ids),
+        time.monotonic() - started,
+    )
+
+
 async def async_setup_services(hass: HomeAssistant) -> None:
     """Set up services for the iDotMatrix integration."""
     if hass.services.has_service(DOMAIN, SERVICE_UPLOAD_GIF):
@@ -51,33 +116,15 @@ async def async_setup_services(hass: HomeAssistant) -> None:
 
     async def handle_screen_on(call: ServiceCall) -> None:
         """Handle screen_on service call."""
-        for entity_id in call.data["entity_id"]:
-            hub = _get_hub_for_entity(hass, entity_id)
-            if hub is None:
-                _LOGGER.warning("Could not find iDotMatrix device for entity %s", entity_id)
-                continue
-            try:
-                await hub.async_screen_on()
-                _LOGGER.info("Screen turned on for %s", entity_id)
-            except TimeoutError:
-                _LOGGER.error("Timeout turning screen on for %s", entity_id)
-            except Exception:
-                _LOGGER.exception("Failed to turn screen on for %s", entity_id)
+        await _async_run_for_entities(
+            hass, call, lambda hub: hub.async_screen_on(force=call.data[ATTR_FORCE])
+        )
 
     async def handle_screen_off(call: ServiceCall) -> None:
         """Handle screen_off service call."""
-        for entity_id in call.data["entity_id"]:
-            hub = _get_hub_for_entity(hass, entity_id)
-            if hub is None:
-                _LOGGER.warning("Could not find iDotMatrix device for entity %s", entity_id)
-                continue
-            try:
-                await hub.async_screen_off()
-                _LOGGER.info("Screen turned off for %s", entity_id)
-            except TimeoutError:
-                _LOGGER.error("Timeout turning screen off for %s", entity_id)
-            except Exception:
-                _LOGGER.exception("Failed to turn screen off for %s", entity_id)
+        await _async_run_for_entities(
+            hass, call, lambda hub: hub.async_screen_off(force=call.data[ATTR_FORCE])
+        )
 
     async def handle_upload_gif(call: ServiceCall) -> None:
         """Handle upload_gif service call."""
@@ -103,18 +150,19 @@ async def async_setup_services(hass: HomeAssistant) -> None:
             _LOGGER.exception("Failed to resolve media: %s", err)
             return
 
-        for entity_id in entity_ids:
-            hub = _get_hub_for_entity(hass, entity_id)
-            if hub is None:
-                _LOGGER.warning("Could not find iDotMatrix device for entity %s", entity_id)
-                continue
-            try:
-                await hub.async_upload_gif(file_path)
-                _LOGGER.info("GIF uploaded to %s", entity_id)
-            except TimeoutError:
-                _LOGGER.error("Timeout uploading GIF to %s", entity_id)
-            except Exception:
-                _LOGGER.exception("Failed to upload GIF to %s", entity_id)
+        # Encode and packetize the file once and share it between all targeted devices
+        shared = SharedGifUpload(
+            file_path,
+            global_palette=call.data[ATTR_GLOBAL_PALETTE],
+            palette_colors=call.data[ATTR_PALETTE_COLORS],
+            delta_frames=call.data[ATTR_DELTA_FRAMES],
+            duplicate_frame_threshold=call.data[ATTR_DUPLICATE_FRAME_THRESHOLD],
+            max_payload_bytes=call.data.get(ATTR_MAX_PAYLOAD_BYTES),
+            max_upload_seconds=call.data.get(ATTR_MAX_UPLOAD_SECONDS),
+        )
+        await _async_run_for_entities(
+            hass, call, lambda hub: hub.async_upload_gif(file_path, shared=shared, force=call.data[ATTR_FORCE])
+        )
 
     hass.services.async_register(
         DOMAIN,
@@ -0,0 +1,38 @@
+"""Persistent per-device data for the iDotMatrix integration."""
+
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+
+from .const import DOMAIN
+
+STORAGE_VERSION = 1
+STORAGE_KEY = f"{DOMAIN}.devices"
+SAVE_DELAY = 10
+
+
+class IDotMatrixStore:
+    """Keeps link parameters learned for each device address across restarts."""
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        self._store: Store[dict[str, dict[str, Any]]] = Store(hass, STORAGE_VERSION, STORAGE_KEY)
+        self._devices: dict[str, dict[str, Any]] = {}
+
+    async def async_load(self) -> None:
+        """Load the stored device data."""
+        self._devices = await self._store.async_load() or {}
+
+    def get_mtu(self, address: str) -> int | None:
+        """Return the ATT MTU last negotiated with the device, if known."""
+        return self._devices.get(address, {}).get("mtu")
+
+    @callback
+    def async_set_mtu(self, address: str, mtu: int) -> None:
+        """Remember the ATT MTU negotiated with the device."""
+        if self.get_mtu(address) == mtu:
+            return
+        self._devices.setdefault(address, {})["mtu"] = mtu
+        self._store.async_delay_save(lambda: self._devices, SAVE_DELAY)
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# the vendored library is imported on its own, without Home Assistant
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
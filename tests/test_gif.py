@@ -0,0 +1,57 @@
+import io
+
+import pytest
+from PIL import Image
+
+from idotmatrix.modules.gif import GifModule
+from idotmatrix.screensize import ScreenSize
+from idotmatrix.util.image_utils import ResizeMode
+
+CANVAS_SIZE = 32
+
+
+def _write_sprite_animation(path, colors, frame_count=10):
+    """
+    Writes an animation of a block and a dot moving over a static background, and returns its frames.
+    The changed region of each frame spans both, so it contains unchanged background pixels.
+    """
+    frames = []
+    for i in range(frame_count):
+        frame = Image.new("RGB", (CANVAS_SIZE, CANVAS_SIZE), colors[0])
+        frame.putpixel((i, i), colors[-1])
+        for x in range(4):
+            for y in range(4):
+                frame.putpixel(((i * 3 + x) % CANVAS_SIZE, 10 + y), colors[1 + (x + y) % (len(colors) - 1)])
+        frames.append(frame)
+    frames[0].save(path, save_all=True, append_images=frames[1:], duration=100, loop=0, disposal=2)
+    return frames
+
+
+SPRITE_COLORS = [
+    (255, 0, 0), (0, 255, 0), (0, 0, 255),
+    (255, 255, 0), (0, 255, 255), (255, 0, 255), (255, 255, 255), (0, 0, 0), (128, 64, 32),
+]
+
+
+@pytest.mark.parametrize("palette_colors", [256, 65, 16])
+@pytest.mark.parametrize("color_count", [3, 9])
+def test_global_palette_delta_frames_decode_to_source(tmp_path, palette_colors, color_count):
+    colors = SPRITE_COLORS[:color_count]
+    source_frames = _write_sprite_animation(tmp_path / "sprite.gif", colors)
+    gif = GifModule(connection_manager=None, screen_size=ScreenSize.SIZE_32x32)
+
+    data = gif._load_gif_and_adapt_to_canvas(
+        file_path=tmp_path / "sprite.gif",
+        canvas_size=CANVAS_SIZE,
+        resize_mode=ResizeMode.FIT,
+        palletize=True,
+        global_palette=True,
+        palette_colors=palette_colors,
+        delta_frames=True,
+    )
+
+    with Image.open(io.BytesIO(data)) as decoded:
+        assert decoded.n_frames == len(source_frames)
+        for i, source_frame in enumerate(source_frames):
+            decoded.seek(i)
+            assert decoded.convert("RGB").tobytes() == source_frame.tobytes(), f"frame {i} differs"
@@ -0,0 +1,40 @@
+import shutil
+from pathlib import Path
+
+from idotmatrix.modules import text
+from idotmatrix.util import glyph_atlas
+
+FONT_PATH = Path(__file__).resolve().parents[1] / "idotmatrix" / "fonts" / "Rain-DRM3.otf"
+
+
+def _load(font_path, directory):
+    text.set_glyph_atlas_directory(directory)
+    try:
+        return text._load_glyph_atlas(str(font_path), 16, 16, 32)
+    finally:
+        text.set_glyph_atlas_directory(None)
+
+
+def test_atlas_is_rebuilt_when_font_changes(tmp_path):
+    font_path = tmp_path / "fonts" / FONT_PATH.name
+    font_path.parent.mkdir()
+    shutil.copyfile(FONT_PATH, font_path)
+    atlas_directory = tmp_path / "atlases"
+
+    atlas = _load(font_path, atlas_directory)
+    assert atlas.font_digest == glyph_atlas.font_digest(font_path)
+
+    # same path, size and cell, but another font file
+    with open(font_path, "ab") as f:
+        f.write(b"\0")
+    rebuilt = _load(font_path, atlas_directory)
+    assert rebuilt.font_digest == glyph_atlas.font_digest(font_path)
+    assert rebuilt.font_digest != atlas.font_digest
+
+
+def test_atlas_of_another_renderer_version_is_stale(tmp_path, monkeypatch):
+    path = glyph_atlas.build_atlas(FONT_PATH, 16, 16, 32, characters="A", path=tmp_path / "font.atlas")
+    assert glyph_atlas.load_atlas(path, glyph_atlas.font_digest(FONT_PATH)) is not None
+
+    monkeypatch.setattr(glyph_atlas, "RENDERER_VERSION", glyph_atlas.RENDERER_VERSION + 1)
+    assert glyph_atlas.load_atlas(path) is None